@@ -0,0 +1,57 @@
+from typing import List
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from core.config import CONVERSATION_TOKEN_BUDGET
+from core.logger import get_logger
+
+logger = get_logger("agent")
+
+
+def split_turns(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Groups a thread into turns, each starting at a HumanMessage."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def current_turn(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """The messages from the latest HumanMessage on: what this run added to the thread."""
+    turns = split_turns(messages)
+    return turns[-1] if turns else []
+
+
+def compact_messages(messages: List[BaseMessage], token_budget: int = CONVERSATION_TOKEN_BUDGET) -> List[RemoveMessage]:
+    """
+    Returns the removals that bring a thread within `token_budget` (approximate tokens).
+    Finished turns are first reduced to the user's message and the final answer, which already
+    carries the foods and macros; the tool calls and search dumps in between only cost tokens.
+    If that isn't enough, the oldest turns are dropped. The latest turn is never touched.
+    """
+    turns = split_turns(messages)
+    if len(turns) < 2:
+        return []
+    removals, kept = [], []
+    for turn in turns[:-1]:
+        answer = turn[-1]
+        answered = isinstance(turn[0], HumanMessage) and isinstance(answer, AIMessage) and not answer.tool_calls
+        keep = [turn[0], answer] if answered and len(turn) > 1 else []
+        removals += [RemoveMessage(id=m.id) for m in turn if not any(m is k for k in keep)]
+        if keep:
+            kept.append(keep)
+
+    total = count_tokens_approximately([m for turn in kept for m in turn] + turns[-1])
+    while kept and total > token_budget:
+        oldest = kept.pop(0)
+        removals += [RemoveMessage(id=m.id) for m in oldest]
+        total -= count_tokens_approximately(oldest)
+    if removals:
+        logger.info("Compacted conversation: removed %s messages, ~%s tokens remain.", len(removals), total)
+    return removals
+
+
+async def compact_history(state):
+    """Graph node in front of every model call: trims the thread before the model sees it (see compact_messages)."""
+    return {"messages": compact_messages(state["messages"])}
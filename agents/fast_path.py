@@ -0,0 +1,141 @@
+import re
+from typing import List, NamedTuple, Optional
+from db.database import engine
+from db.food_catalog import food_catalog
+from tools.food_tools import insert_food_logs
+from core.units import lookup_unit, portion_items
+from core.logger import get_logger
+
+logger = get_logger("fast_path")
+
+# --- Configuration ---
+# Stricter than the search tool's MATCH_THRESHOLD: nobody double-checks what the fast path logs.
+FAST_PATH_THRESHOLD = 0.85
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "half": 0.5, "quarter": 0.25,
+}
+ITEM_SEPARATORS = re.compile(r"\s*(?:,|;|\+|&|\n|\band\b|\bwith\b|\balong with\b)\s*", re.IGNORECASE)
+LEADING_FILLER = re.compile(r"^(?:i\s+(?:just\s+)?(?:had|ate|have had|have eaten|drank)|log|please log|add)\s+", re.IGNORECASE)
+TRAILING_FILLER = re.compile(r"\s+(?:for|at)\s+(?:breakfast|lunch|dinner|snacks?|brunch)\s*$|\s*(?:today|just now)\s*$", re.IGNORECASE)
+QUANTITY = re.compile(r"^(?P<number>\d+/\d+|\d+(?:\.\d+)?)\s*(?P<rest>.*)$")
+# Messages that correct or refer back to an earlier turn ("no, make it 3 roti", "remove the rice").
+# Their foods are already logged, so logging them again here would double count; the agent has the thread.
+# A leading "no"/"not" counts only when a pause or a correcting word follows: "no sugar chai" is a meal.
+FOLLOW_UP = re.compile(
+    r"^(?:no|not|nope)\s*(?:[,.!-]|$)|^(?:no|not)\s+(?:it|that|this|those|i|make|change|actually|just|only)\b|"
+    r"^(?:nope|actually|wait|sorry|oops|instead|i meant|correction|change|make (?:it|that|them)|"
+    r"remove|delete|undo|replace|update|fix|same)\b|\b(?:instead of|not \d|rather than|that was|it was)\b",
+    re.IGNORECASE,
+)
+
+
+class ParsedItem(NamedTuple):
+    raw: str
+    quantity: float
+    unit: Optional[str]
+    food: str
+
+
+class FastPathResult(NamedTuple):
+    logged: List[dict]
+    unresolved: List[str]
+
+    def summary(self) -> str:
+        lines = [
+            f"- {item['quantity']:g} {item['unit']} {item['item_name']}: {item['calories']:g} kcal, "
+            f"protein {item['protein']:g} g, carbs {item['carbs']:g} g, fat {item['fat']:g} g"
+            for item in self.logged
+        ]
+        totals = {key: round(sum(item[key] for item in self.logged), 1) for key in ("calories", "protein", "carbs", "fat")}
+        lines.append(
+            f"Total: {totals['calories']:g} kcal, protein {totals['protein']:g} g, "
+            f"carbs {totals['carbs']:g} g, fat {totals['fat']:g} g"
+        )
+        return "Logged:\n" + "\n".join(lines)
+
+
+def _parse_quantity(text: str):
+    """Splits a leading quantity off `text`. Returns (quantity, rest); quantity defaults to 1."""
+    match = QUANTITY.match(text)
+    if match:
+        number = match.group("number")
+        if "/" in number:
+            numerator, denominator = number.split("/")
+            quantity = float(numerator) / float(denominator) if float(denominator) else 1.0
+        else:
+            quantity = float(number)
+        return quantity, match.group("rest")
+
+    first, _, rest = text.partition(" ")
+    if first in NUMBER_WORDS and rest:
+        return float(NUMBER_WORDS[first]), rest
+    return 1.0, text
+
+
+def parse_meal(text: str) -> List[ParsedItem]:
+    """Turns "2 roti, a katori of dal and 200g rice" into one ParsedItem per food."""
+    text = TRAILING_FILLER.sub("", LEADING_FILLER.sub("", text.strip()))
+    items = []
+    for raw in ITEM_SEPARATORS.split(text):
+        chunk = raw.strip().lower()
+        if not chunk:
+            continue
+        quantity, rest = _parse_quantity(chunk)
+
+        unit = None
+        # "200g rice" arrives here as quantity 200 with "g rice" left over, so glued units need no special case.
+        first, _, remainder = rest.partition(" ")
+        if remainder and lookup_unit(first) is not None:
+            unit, rest = lookup_unit(first).name, remainder
+
+        rest = re.sub(r"^of\s+", "", rest.strip())
+        if rest:
+            items.append(ParsedItem(raw=raw.strip(), quantity=quantity, unit=unit, food=rest))
+    return items
+
+
+def is_follow_up(text: str) -> bool:
+    """Whether a message corrects or refers back to an earlier turn rather than naming a new meal."""
+    return bool(FOLLOW_UP.search(text.strip()))
+
+
+def resolve_items(items: List[ParsedItem]) -> List[Optional[dict]]:
+    """Resolves parsed items against the catalog and scales their macros; None where that isn't safe."""
+    matches = [food_catalog.best_match(item.food) for item in items]
+    confident = [(item, match[1]) for item, match in zip(items, matches) if match is not None and match[0] >= FAST_PATH_THRESHOLD]
+    scaled = iter(portion_items([(food, item.quantity, item.unit) for item, food in confident]))
+    return [
+        next(scaled) if match is not None and match[0] >= FAST_PATH_THRESHOLD else None
+        for match in matches
+    ]
+
+
+async def run_fast_path(user_input: str, user_id: int) -> FastPathResult:
+    """
+    Logs every item of the meal that the catalog resolves confidently, without calling the LLM.
+    Whatever it can't resolve is returned so the agent can handle just those items.
+    """
+    if not food_catalog.loaded or is_follow_up(user_input):
+        return FastPathResult(logged=[], unresolved=[user_input])
+
+    parsed = parse_meal(user_input)
+    if not parsed:
+        return FastPathResult(logged=[], unresolved=[user_input])
+
+    logged, unresolved = [], []
+    for item, resolved in zip(parsed, resolve_items(parsed)):
+        if resolved is None:
+            unresolved.append(item.raw)
+        else:
+            logged.append(resolved)
+
+    if not logged:
+        # Nothing recognised: hand the agent the user's own words rather than our split of them.
+        return FastPathResult(logged=[], unresolved=[user_input])
+
+    async with engine.begin() as connection:
+        await insert_food_logs(connection, user_id, logged)
+    logger.info("Fast path logged %s; left for agent: %s", [item['item_name'] for item in logged], unresolved)
+    return FastPathResult(logged=logged, unresolved=unresolved)
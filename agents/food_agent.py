@@ -1,61 +1,172 @@
-import operator
+import asyncio
 from typing import TypedDict, Annotated, List
-from langchain_core.messages import BaseMessage
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
 from langgraph.graph import StateGraph, END
+from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
-from core.config import OPENAI_API_KEY, TAVILY_API_KEY
-from core.logger import logger
+from core.config import OPENAI_API_KEY, OPENAI_BASE_URL, TAVILY_API_KEY, LLM_MAX_CONCURRENCY, OPENAI_TIMEOUT_SECONDS
+from core.logger import get_logger
+from core.metrics import metrics
+from core.resilience import openai_client
+from agents.compaction import compact_history
 
 from tools.food_tools import (
     search_food_database,
+    search_food_database_batch,
     log_food_to_database,
+    log_foods_to_database,
+    remove_logged_foods,
+    get_nutrition_totals,
     add_new_food_to_database,
     search_internet_for_nutrition
 )
 
+logger = get_logger("agent")
+payload_logger = get_logger("payload")
+
 class FoodAgentState(TypedDict):
-    messages: Annotated[List[BaseMessage], operator.add]
+    # add_messages (rather than plain concatenation) lets compaction remove messages by id.
+    messages: Annotated[List[BaseMessage], add_messages]
+
 
+# --- Prompt ---
+SYSTEM_PROMPT = (
+    "You are a precise, instruction-following diet logging robot named Aarogya.\n\n"
+    "**EXECUTE THIS WORKFLOW EXACTLY:**\n"
+    "1.  Call `search_food_database_batch` **ONCE** with every food item in the user's meal. Only use `search_food_database` for a single item or to retry one name.\n"
+    "2.  **IF A FOOD IS FOUND:** Immediately proceed to Step 4. If the result instead lists `similar_items` and one of them is clearly the same dish, search again with that exact name before going online.\n"
+    "3.  **IF A FOOD IS NOT FOUND:**\n"
+    "    a. Call `search_internet_for_nutrition` **ONCE AND ONLY ONCE** for that item. Search for all missing items in the same turn.\n"
+    "    b. If the search fails or returns an error, your task for this item is **FAILED**. Report this failure in your final summary. **DO NOT PROCEED.**\n"
+    "    c. If the search succeeds, parse the data and call `add_new_food_to_database`.\n"
+    "4.  **FINAL ACTION - LOGGING:** Once every item is in the database (from step 2 or 3c), call `log_foods_to_database` **ONCE** with each food's database name and the amount eaten as the user gave it (quantity and unit, e.g. 2 piece, 150 g, 1 katori). Do not calculate macros yourself: the tool computes them and returns what it logged. If it reports an item it couldn't log, fix that item (e.g. give the amount in grams) and log it again. Only use `log_food_to_database` when the meal has a single item.\n\n"
+    "Earlier turns of the conversation are kept. Use them to resolve follow-ups. To correct an entry (\"make that two\", \"actually it was brown rice\", \"remove the rice\"), first call `remove_logged_foods` with the logged name of each wrong entry, then log the corrected items as above (searching for any new food). Never log a corrected food on top of its old entry.\n\n"
+    "If the user asks how much they have eaten (today, yesterday or this week) instead of logging a meal, call `get_nutrition_totals` and answer from its result.\n\n"
+    "**---CRITICAL INSTRUCTION: TASK COMPLETION---**\n"
+    "The `log_foods_to_database` (or `log_food_to_database`) tool is the **TERMINAL** step for any successful food item. The moment you call this tool, your work on those items is **100% COMPLETE.**\n"
+    "After processing all items from the user's request (either by logging them or marking them as failed), your **ONLY** remaining task is to output a single, natural language summary to the user. The summary must include the macros of the food item, as returned by the logging tool. **YOUR FINAL RESPONSE MUST NOT CONTAIN ANY TOOL CALLS.**"
+)
+# Sent ahead of every model call instead of living in the thread: an identical prefix on every
+# request is what provider-side prompt caching keys on, and the checkpoints stay small.
+SYSTEM_MESSAGE = SystemMessage(content=SYSTEM_PROMPT)
 
-if not OPENAI_API_KEY or not TAVILY_API_KEY:
-    logger.error("API keys for OpenAI and Tavily not found. Please set them in your .env file.")
-    raise ValueError("API keys for OpenAI and Tavily not found. Please set them in your .env file.")
 
 tools = [
     search_food_database,
+    search_food_database_batch,
     log_food_to_database,
+    log_foods_to_database,
+    remove_logged_foods,
+    get_nutrition_totals,
     add_new_food_to_database,
     search_internet_for_nutrition
 ]
 # ToolNode is smart and will run async tools correctly
 tool_node = ToolNode(tools)
 
-model = ChatOpenAI(model="gpt-4o-mini-2024-07-18", temperature=0, api_key=OPENAI_API_KEY)
-model = model.bind_tools(tools)
+# Shared by every session in the process, so a burst of users can't exceed the provider's rate limits.
+llm_limiter = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+# --- Model ---
+# Built on first use: langchain_openai and the openai SDK are the slowest imports in the app,
+# and a missing key should fail the first model call rather than every import of this module.
+_default_model = None
+
+
+def get_chat_model():
+    """The tool-bound OpenAI chat model, constructed once per process."""
+    global _default_model
+    if _default_model is None:
+        if not OPENAI_API_KEY or not TAVILY_API_KEY:
+            logger.error("API keys for OpenAI and Tavily not found. Please set them in your .env file.")
+            raise ValueError("API keys for OpenAI and Tavily not found. Please set them in your .env file.")
+        from langchain_openai import ChatOpenAI
+        from openai import DefaultAsyncHttpxClient
+
+        model = ChatOpenAI(
+            model="gpt-4o-mini-2024-07-18", temperature=0, api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL,
+            # Retries and deadlines are handled by core/resilience.py; the SDK's own would stack on top of them.
+            max_retries=0, timeout=OPENAI_TIMEOUT_SECONDS,
+            # Only swapped in when metrics are on, so the default client is untouched otherwise.
+            http_async_client=DefaultAsyncHttpxClient(event_hooks=metrics.httpx_hooks()) if metrics.enabled else None,
+        )
+        _default_model = model.bind_tools(tools)
+    return _default_model
+
 
-async def call_model(state: FoodAgentState):
-    """The primary node that calls the LLM asynchronously."""
-    logger.info("Agent: Calling model...")
-    response = await model.ainvoke(state["messages"])
-    if response.tool_calls:
-        logger.info(f"Agent: Model requested tool calls: {response.tool_calls}")
-    return {"messages": [response]}
+class StreamWatch(BaseCallbackHandler):
+    """Notices the first text token of a streamed model call; after it, a retry would stream the reply twice."""
+
+    def __init__(self):
+        self.streamed = False
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        # Tool-call chunks come through with empty text and are never shown, so they don't count.
+        if token:
+            self.streamed = True
+
+
+def make_model_node(bound_model=None):
+    """
+    Builds the agent node around a tool-bound chat model, so tests and benchmarks can swap the model.
+    Without one, the node uses get_chat_model() at its first call.
+    """
+    async def call_model(state: FoodAgentState, config: RunnableConfig = None):
+        """The primary node that calls the LLM asynchronously."""
+        logger.info("Agent: Calling model...")
+        async with llm_limiter:
+            model = bound_model or get_chat_model()
+            watch = StreamWatch()
+            run_config = merge_configs(config or {}, {"callbacks": [watch]})
+            response = await openai_client.call(
+                lambda: model.ainvoke([SYSTEM_MESSAGE, *state["messages"]], config=run_config),
+                can_retry=lambda: not watch.streamed,
+            )
+        if response.tool_calls:
+            # The fields let bench/workload.py attribute the calls to a turn when sessions interleave.
+            user_id = (config or {}).get("configurable", {}).get("user_id")
+            payload_logger.info("Agent: Model requested tool calls: %s", response.tool_calls,
+                                extra={"user_id": user_id, "tool_calls": response.tool_calls})
+        return {"messages": [response]}
+    return call_model
+
+call_model = make_model_node()
 
 # --- Graph Definition ---
-def build_agent_graph():
+def build_agent_graph(chat_model=None, checkpointer=None):
+    """
+    Compiles the agent graph; `chat_model` replaces the default OpenAI model (e.g. bench/scripted_model.py).
+    With a checkpointer (db/checkpointer.py) each thread_id keeps its conversation across turns.
+    """
     workflow = StateGraph(FoodAgentState)
-    workflow.add_node("agent", call_model)
+    workflow.add_node("compact", compact_history)
+    workflow.add_node("agent", call_model if chat_model is None else make_model_node(chat_model.bind_tools(tools)))
     workflow.add_node("tools", tool_node)
 
-    workflow.set_entry_point("agent")
+    workflow.set_entry_point("compact")
+    workflow.add_edge("compact", "agent")
 
     workflow.add_conditional_edges(
         "agent",
         lambda x: "tools" if x["messages"][-1].tool_calls else END,
         {"tools": "tools", END: END}
     )
-    workflow.add_edge("tools", "agent")
+    # Back through compaction, so every model call (not just the first of a turn) sees a thread within budget.
+    workflow.add_edge("tools", "compact")
 
     # .compile() creates the runnable graph object
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer)
+
+_default_graph = None
+
+
+def get_agent_graph():
+    """The app's compiled graph with Postgres-backed conversations, compiled once per process."""
+    global _default_graph
+    if _default_graph is None:
+        from db.checkpointer import PostgresCheckpointSaver
+        _default_graph = build_agent_graph(checkpointer=PostgresCheckpointSaver())
+    return _default_graph
@@ -0,0 +1,262 @@
+import json
+import time
+from sqlalchemy import text
+from langchain_core.messages import AIMessage, HumanMessage
+from db.database import engine
+from db.food_catalog import normalize_food_name, name_tokens
+from agents.compaction import current_turn
+from agents.fast_path import FastPathResult, is_follow_up, parse_meal, run_fast_path
+from agents.response_cache import response_cache, logged_items_from_messages
+from tools.food_tools import insert_food_logs
+from core.config import WORKLOAD_CAPTURE
+from core.logger import get_logger
+from core.metrics import metrics
+from core.resilience import ProviderUnavailable, openai_client
+
+logger = get_logger("pipeline")
+# One record per turn with the user's exact words, for capturing replayable workloads (bench/workload.py).
+# Written only with WORKLOAD_CAPTURE on.
+workload_logger = get_logger("workload")
+
+# Users already known to exist in this process, so ensure_user costs a round trip only once per user.
+_known_users = set()
+
+
+async def ensure_user(user_id: int):
+    """
+    Creates the users row a local session (the REPL, benchmarks) logs against, if it doesn't exist yet.
+    Serving mode never calls this: it only acts for users that hold a token (db/users.py).
+    """
+    if user_id in _known_users:
+        return
+    async with engine.begin() as conn:
+        created = await conn.execute(
+            text("INSERT INTO users (user_id, username) VALUES (:user_id, :username) ON CONFLICT DO NOTHING"),
+            {"user_id": user_id, "username": f"user_{user_id}"},
+        )
+        if created.rowcount:
+            # An explicit id doesn't advance the SERIAL sequence; move it past, so later inserts can't collide.
+            await conn.execute(text("SELECT setval(pg_get_serial_sequence('users', 'user_id'), (SELECT MAX(user_id) FROM users))"))
+    _known_users.add(user_id)
+
+
+# --- Conversation ---
+def conversation_config(app, user_id: int) -> dict:
+    """Run config for a user's turn: their id for the tools and, with a checkpointer, their conversation thread."""
+    configurable = {"user_id": user_id}
+    if app.checkpointer is not None:
+        configurable["thread_id"] = f"user-{user_id}"
+    return {"configurable": configurable, "callbacks": metrics.callbacks()}
+
+
+def run_options(app) -> dict:
+    # The thread is saved once when the run ends instead of after every step: one write per turn,
+    # and a turn that fails midway is simply not remembered.
+    return {"durability": "exit"} if app.checkpointer is not None else {}
+
+
+async def remember_exchange(app, config: dict, user_input: str, reply: str):
+    """Adds a turn answered without the agent (cache replay or fast path) to the user's conversation."""
+    if app.checkpointer is None:
+        return
+    await app.aupdate_state(config, {"messages": [HumanMessage(content=user_input), AIMessage(content=reply)]}, as_node="agent")
+
+
+def agent_request(user_input: str, fast_result) -> str:
+    """The user message the agent sees; when the fast path logged part of the meal it is told what's left."""
+    if not fast_result.logged:
+        return user_input
+    done = ", ".join(item["item_name"] for item in fast_result.logged)
+    return f"{user_input}\n\n(Already logged from the food database: {done}. Log only: {', '.join(fast_result.unresolved)})"
+
+
+def self_contained(user_input: str, items) -> bool:
+    """
+    Whether every logged item is named in the user's own words, so replaying this reply for the
+    same text later is right. "make that two" logs foods from earlier turns and must not be cached.
+    """
+    words = name_tokens(normalize_food_name(user_input))
+    return all(name_tokens(normalize_food_name(item["item_name"])) & words for item in items)
+
+
+def unhandled_items(fragments, items) -> list:
+    """The parts of `fragments` (meal text the agent was asked to log) that none of the logged `items` names."""
+    logged_words = [name_tokens(normalize_food_name(item["item_name"])) for item in items]
+    left = []
+    for fragment in fragments:
+        for part in parse_meal(fragment) or []:
+            words = name_tokens(normalize_food_name(part.food))
+            if not any(words & logged for logged in logged_words):
+                left.append(part.raw)
+    return left
+
+
+# --- Progress Messages ---
+# Tool name -> what the user sees while it runs; {arg} placeholders come from the tool call's arguments.
+TOOL_PROGRESS = {
+    "search_food_database": "Looking up {food_name} in the food database...",
+    "search_food_database_batch": "Looking up {food_names} in the food database...",
+    "search_internet_for_nutrition": "Searching the web for {food_name}...",
+    "add_new_food_to_database": "Adding {name} to the food database...",
+    "log_food_to_database": "Logging {food_name}...",
+    "log_foods_to_database": "Logging {items}...",
+    "remove_logged_foods": "Removing {food_names} from today's log...",
+    "get_nutrition_totals": "Adding up your {period} totals...",
+}
+
+
+def _describe_args(args: dict) -> dict:
+    described = {}
+    for key, value in args.items():
+        if key == "items":
+            value = ", ".join(item.get("food_name", "?") for item in value)
+        elif isinstance(value, list):
+            value = ", ".join(map(str, value))
+        described[key] = value
+    return described
+
+
+def tool_progress(event: dict):
+    """A one-line progress message for an astream_events tool event, or None if it isn't worth showing."""
+    name, data = event["name"], event.get("data", {})
+    if event["event"] == "on_tool_start":
+        template = TOOL_PROGRESS.get(name)
+        args = data.get("input") or {}
+        try:
+            return template.format(**_describe_args(args)) if template else None
+        except (KeyError, AttributeError):
+            return None
+    output = str(getattr(data.get("output"), "content", data.get("output")) or "")
+    if name == "search_food_database_batch":
+        try:
+            results = json.loads(output)
+        except ValueError:
+            return None
+        found = [food for food, result in results.items() if "error" not in result]
+        missing = [food for food in results if food not in found]
+        parts = ([f"found {', '.join(found)} in the database"] if found else []) + ([f"{', '.join(missing)} not found"] if missing else [])
+        summary = "; ".join(parts)
+        return summary[0].upper() + summary[1:] + "." if parts else None
+    if name == "search_food_database":
+        return None if '"error"' in output else "Found it in the database."
+    if name in ("log_food_to_database", "log_foods_to_database") and not output.startswith("Error"):
+        try:
+            not_logged = json.loads(output).get("not_logged") or []
+        except ValueError:
+            return None
+        return f"Couldn't log {', '.join(item['food_name'] for item in not_logged)} yet." if not_logged else None
+    if name == "remove_logged_foods" and not output.startswith("Error"):
+        try:
+            not_found = json.loads(output).get("not_found") or []
+        except ValueError:
+            return None
+        return f"Couldn't find {', '.join(not_found)} in today's log." if not_found else None
+    if output.startswith("Error"):
+        return output
+    return None
+
+
+# --- Turns ---
+# The reply for whatever the fast path couldn't log while the model provider is unreachable.
+UNAVAILABLE_REPLY = "I can't reach the AI service right now, so I couldn't log: {items}. Please try again in a minute."
+
+
+async def turn_events(app, user_id: int, user_input: str, stream: bool = True):
+    """
+    Runs one user turn: a replay from the response cache if this exact meal was handled before,
+    otherwise the deterministic fast path first and then the agent graph for whatever is left.
+    Yields {"type": "progress" | "token" | "reply", "text": ...} events; "reply" (the whole answer)
+    always comes last. With stream=False only the reply is produced and the graph runs via ainvoke.
+    Safe to call concurrently for many users; the user id travels to the tools in the run config.
+    The user must exist (see ensure_user).
+    """
+    started = time.perf_counter()
+    if WORKLOAD_CAPTURE:
+        workload_logger.info("Turn for user %s: %s", user_id, user_input, extra={"user_id": user_id, "meal": user_input})
+    config = conversation_config(app, user_id)
+
+    # A correction ("no, make it 3 roti") depends on the thread: neither replayed from nor stored in the cache.
+    follow_up = is_follow_up(user_input)
+    cached = None if follow_up else response_cache.get(user_id, user_input)
+    if cached is not None:
+        async with engine.begin() as connection:
+            await insert_food_logs(connection, user_id, [dict(item) for item in cached.items])
+        logger.info("Replayed cached meal for user %s (%s items).", user_id, len(cached.items))
+        await remember_exchange(app, config, user_input, cached.reply)
+        if metrics.enabled:
+            metrics.observe("turn_seconds", time.perf_counter() - started, path="cache")
+        yield {"type": "reply", "text": cached.reply}
+        return
+
+    replies = []
+    # Items the catalog knows are logged directly; only the rest costs model calls.
+    with metrics.span("fast_path_seconds"):
+        fast_result = await run_fast_path(user_input, user_id=user_id)
+    logged = list(fast_result.logged)
+    if fast_result.logged:
+        replies.append(fast_result.summary())
+        if stream:
+            yield {"type": "token", "text": replies[0]}
+
+    cacheable, agent_ran, unhandled = True, False, fast_result.unresolved
+    # While the model provider's circuit is open, skip the agent rather than queue behind its timeouts.
+    if fast_result.unresolved and openai_client.available:
+        # The logging tools append what they commit here, so a run that fails afterwards still reports it.
+        committed = []
+        agent_config = {**config, "configurable": {**config["configurable"], "committed_items": committed}}
+        try:
+            # Only the new message goes in; with a checkpointer the thread supplies the earlier turns.
+            messages = [HumanMessage(content=agent_request(user_input, fast_result))]
+            if not stream:
+                final_state = await app.ainvoke({"messages": messages}, config=agent_config, **run_options(app))
+            else:
+                final_state = None
+                separator = "\n\n" if replies else ""
+                async for event in app.astream_events({"messages": messages}, config=agent_config, version="v2", **run_options(app)):
+                    kind = event["event"]
+                    if kind == "on_chat_model_stream":
+                        chunk = event["data"]["chunk"]
+                        # Tool-calling turns stream argument fragments with no content; only the summary is text.
+                        if isinstance(chunk.content, str) and chunk.content and not chunk.tool_call_chunks:
+                            yield {"type": "token", "text": separator + chunk.content}
+                            separator = ""
+                    elif kind in ("on_tool_start", "on_tool_end"):
+                        message = tool_progress(event)
+                        if message:
+                            yield {"type": "progress", "text": message}
+                    elif kind == "on_chain_end" and not event.get("parent_ids"):
+                        final_state = event["data"]["output"]
+            replies.append(final_state["messages"][-1].content)
+
+            agent_items = logged_items_from_messages(current_turn(final_state["messages"]))
+            cacheable = agent_items is not None and self_contained(user_input, agent_items)
+            logged += agent_items or []
+            agent_ran = True
+        except ProviderUnavailable as e:
+            logger.error("Agent unavailable for user %s: %s", user_id, e)
+            # The provider can fail on the closing summary after the items were already logged.
+            if committed:
+                logged += committed
+                replies.append(FastPathResult(logged=committed, unresolved=[]).summary())
+                unhandled = unhandled_items(fast_result.unresolved, committed)
+    if fast_result.unresolved and not agent_ran:
+        if unhandled:
+            replies.append(UNAVAILABLE_REPLY.format(items=", ".join(unhandled)))
+        cacheable = False
+
+    reply = "\n\n".join(replies)
+    if not agent_ran:
+        await remember_exchange(app, config, user_input, reply)
+    if metrics.enabled:
+        path = "fast_path" if not fast_result.unresolved else "agent" if agent_ran else "degraded"
+        metrics.observe("turn_seconds", time.perf_counter() - started, path=path)
+    if cacheable and logged and not follow_up:
+        response_cache.put(user_id, user_input, logged, reply)
+    yield {"type": "reply", "text": reply}
+
+
+async def handle_meal(app, user_id: int, user_input: str) -> str:
+    """Runs one user turn to completion and returns the reply (see turn_events)."""
+    async for event in turn_events(app, user_id, user_input, stream=False):
+        reply = event["text"]
+    return reply
@@ -0,0 +1,158 @@
+import json
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+from langchain_core.messages import AIMessage, ToolMessage
+from core.config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS
+from db.food_catalog import food_catalog, normalize_food_name, name_tokens
+from core.logger import get_logger
+
+logger = get_logger("response_cache")
+
+# Tools whose successful calls are what a replay has to reproduce.
+LOGGING_TOOLS = {"log_food_to_database", "log_foods_to_database"}
+# A turn that calls one of these did more than log a meal (read totals, undo entries); it isn't replayed.
+UNREPLAYABLE_TOOLS = {"get_nutrition_totals", "remove_logged_foods"}
+# A catalog change touching more rows than this (a bulk import) clears the cache outright.
+CLEAR_ALL_ROWS = 100
+
+
+def meal_key_text(user_input: str) -> str:
+    """
+    normalize_food_name for cache keys: punctuation inside a number is kept, since
+    "1/2 katori dal" and "1.2 katori dal" are different meals.
+    """
+    text = unicodedata.normalize("NFKD", user_input).encode("ascii", "ignore").decode().lower()
+    text = re.sub(r"(?<=\d)([./,])(?=\d)|[^a-z0-9]+", lambda match: match.group(1) or " ", text)
+    return " ".join(text.split())
+
+
+class CachedMeal(NamedTuple):
+    items: List[dict]           # exactly what insert_food_logs wrote, minus the user
+    reply: str
+    food_ids: frozenset         # catalog rows the items came from
+    tokens: frozenset           # words of the meal text, to spot foods that would now match it
+    stored_at: float
+
+
+class MealResponseCache:
+    """
+    Bounded LRU + TTL map from (user, normalized meal text) to the items and reply of a completed turn.
+    A hit lets the pipeline replay the daily_logs writes without calling the model at all. Entries
+    are per user because the agent's reply can refer to that user's earlier turns.
+    Entries are evicted when a catalog change touches a food they used or a food whose name
+    appears in their text, since the same words could now resolve differently.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._keys_by_food = {}     # food_id -> keys of the entries that logged it
+        self._keys_by_token = {}    # word of the meal text -> keys of the entries whose text has it
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(user_id: int, user_input: str) -> Tuple[int, str]:
+        return user_id, meal_key_text(user_input)
+
+    def _index(self, key, entry: CachedMeal, add: bool):
+        for index, values in ((self._keys_by_food, entry.food_ids), (self._keys_by_token, entry.tokens)):
+            for value in values:
+                keys = index.setdefault(value, set())
+                if add:
+                    keys.add(key)
+                else:
+                    keys.discard(key)
+                    if not keys:
+                        del index[value]
+
+    def _drop(self, key):
+        self._index(key, self._entries.pop(key), add=False)
+
+    def get(self, user_id: int, user_input: str) -> Optional[CachedMeal]:
+        key = self.key(user_id, user_input)
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry.stored_at > self.ttl_seconds:
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, user_id: int, user_input: str, items: List[dict], reply: str):
+        key = self.key(user_id, user_input)
+        if not key[1] or not items:
+            return
+        if key in self._entries:
+            self._drop(key)
+        food_ids = frozenset(item["food_id"] for item in items if item.get("food_id") is not None)
+        entry = self._entries[key] = CachedMeal(
+            items=[dict(item) for item in items], reply=reply, food_ids=food_ids,
+            tokens=name_tokens(normalize_food_name(user_input)), stored_at=time.monotonic(),
+        )
+        self._index(key, entry, add=True)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate_foods(self, rows: List[dict]):
+        """Catalog change listener: drops every entry that `rows` could have changed the answer for."""
+        if len(rows) > CLEAR_ALL_ROWS:
+            if self._entries:
+                logger.info("Response cache: cleared %s entries after a change to %s foods.", len(self._entries), len(rows))
+            self.clear()
+            return
+
+        stale = set()
+        for row in rows:
+            stale |= self._keys_by_food.get(row["food_id"], set())
+            for name in [row["name"], *(row.get("search_aliases") or [])]:
+                tokens = name_tokens(normalize_food_name(name))
+                if tokens:
+                    # Entries whose text has every word of the name.
+                    stale |= set.intersection(*sorted((self._keys_by_token.get(token, set()) for token in tokens), key=len))
+        for key in stale:
+            self._drop(key)
+        if stale:
+            logger.info("Response cache: invalidated %s entries after a catalog change.", len(stale))
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_food.clear()
+        self._keys_by_token.clear()
+
+
+def logged_items_from_messages(messages) -> Optional[List[dict]]:
+    """
+    Pulls the items an agent run actually logged out of its message history. The logging tools
+    return what they wrote (macros included), so the items come from their results, not the calls.
+    Returns None when a replay couldn't reproduce the turn faithfully: a tool call failed or left
+    items unlogged (so the reply reports a failure), or the turn read totals or removed entries.
+    """
+    results = {m.tool_call_id: m.content for m in messages if isinstance(m, ToolMessage)}
+    items = []
+    for message in messages:
+        if not isinstance(message, AIMessage):
+            continue
+        for call in message.tool_calls:
+            outcome = str(results.get(call["id"], ""))
+            if outcome.startswith("Error") or call["name"] in UNREPLAYABLE_TOOLS:
+                return None
+            if call["name"] in LOGGING_TOOLS:
+                try:
+                    outcome = json.loads(outcome)
+                except ValueError:
+                    return None
+                if outcome.get("not_logged"):
+                    return None
+                items.extend(outcome.get("logged", []))
+    return items
+
+
+response_cache = MealResponseCache()
+food_catalog.add_change_listener(response_cache.invalidate_foods)
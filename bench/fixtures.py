@@ -0,0 +1,35 @@
+# --- Seed Catalog ---
+# Enough common items that most benchmark meals resolve locally, as they do in production.
+SEED_FOODS = [
+    # name, aliases, serving_unit, serving_weight_grams, calories, protein, carbs, fat
+    ("roti", ["chapati", "phulka"], "piece", 40, 120, 3.1, 18.0, 3.7),
+    ("dal tadka", ["dal", "tadka dal"], "katori", 150, 180, 9.0, 20.0, 7.0),
+    ("steamed rice", ["rice", "chawal"], "katori", 150, 195, 4.0, 43.0, 0.4),
+    ("jalebi", ["jilebi"], "piece", 55, 150, 2.0, 30.0, 3.5),
+    ("idli", [], "piece", 40, 58, 2.0, 12.0, 0.2),
+    ("sambar", [], "katori", 150, 130, 6.0, 18.0, 4.0),
+    ("masala dosa", ["dosa"], "piece", 150, 330, 7.0, 45.0, 14.0),
+    ("poha", [], "plate", 180, 270, 5.0, 45.0, 8.0),
+    ("paneer butter masala", [], "katori", 150, 350, 12.0, 12.0, 28.0),
+    ("masala chai", ["chai", "tea"], "cup", 150, 100, 3.0, 12.0, 4.0),
+    ("aloo paratha", ["paratha"], "piece", 120, 290, 6.0, 38.0, 13.0),
+    ("curd", ["dahi", "yogurt"], "katori", 150, 90, 5.0, 7.0, 4.5),
+]
+
+# --- Meal Mix ---
+# Roughly: repeat breakfasts the fast path resolves, meals with a near-miss or an odd unit the
+# agent has to look at, and unknown dishes that go out to the (local) search stand-in.
+BENCH_MEALS = [
+    "2 roti, dal and rice",
+    "1 masala dosa and sambar",
+    "3 idli with sambar",
+    "a cup of masala chai",
+    "1 plate poha and chai",
+    "2 aloo paratha with curd",
+    "1 katori paneer butter masala and 2 roti",
+    "2 jalebi",
+    "1 bowl dal makhani and jeera rice",
+    "half plate chole bhature",
+    "1 glass lassi",
+    "2 pieces rasgulla",
+]
@@ -0,0 +1,241 @@
+"""
+Offline benchmark: drives the compiled agent graph with a scripted model, the local Tavily
+stand-in and a throwaway Postgres database, and reports turn latency, model calls, DB queries
+and throughput at each concurrency level.
+
+    python -m bench.run --sessions 1,8,32 --turns 5
+    python -m bench.run --path agent --model-latency 0.3
+
+Needs a reachable Postgres server (the POSTGRES_* settings); the benchmark database is created
+next to the configured one and dropped afterwards. Results land in bench/results/<timestamp>.json
+and each run is compared against the previous one.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from devtools.local_tavily import LocalTavilyServer
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+# --- Throwaway Database ---
+def _server_url():
+    # Read straight from the environment: core.config must not load before run() has set DATABASE_URL.
+    load_dotenv()
+    user, password = os.getenv("POSTGRES_USER"), os.getenv("POSTGRES_PASSWORD")
+    return make_url(f"postgresql+asyncpg://{user}:{password}@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/postgres")
+
+
+async def _admin(statement: str):
+    admin_engine = create_async_engine(_server_url(), isolation_level="AUTOCOMMIT")
+    try:
+        async with admin_engine.connect() as connection:
+            await connection.execute(text(statement))
+    finally:
+        await admin_engine.dispose()
+
+
+async def _seed(engine):
+    from bench.fixtures import SEED_FOODS
+    async with engine.begin() as connection:
+        await connection.execute(
+            text("""
+                INSERT INTO indian_food_items (name, search_aliases, serving_unit, serving_weight_grams, calories, protein_grams, carbs_grams, fat_grams)
+                VALUES (:name, :aliases, :unit, :grams, :calories, :protein, :carbs, :fat)
+            """),
+            [
+                dict(zip(("name", "aliases", "unit", "grams", "calories", "protein", "carbs", "fat"), row))
+                for row in SEED_FOODS
+            ],
+        )
+
+
+# --- Measurement ---
+class QueryCounter:
+    """Counts every statement the app engine sends to Postgres."""
+
+    def __init__(self, engine):
+        self.total = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.total += 1
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def _run_level(app, sessions: int, turns: int, path: str, model, counter, user_offset: int):
+    from agents.pipeline import conversation_config, ensure_user, handle_meal, run_options
+    from agents.response_cache import response_cache
+    from bench.fixtures import BENCH_MEALS
+
+    # Every level starts cold, so levels are comparable with each other and with earlier runs.
+    response_cache.clear()
+    latencies, errors = [], 0
+
+    async def session(index: int):
+        nonlocal errors
+        user_id = user_offset + index + 1
+        await ensure_user(user_id)
+        for turn in range(turns):
+            meal = BENCH_MEALS[(index + turn) % len(BENCH_MEALS)]
+            started = time.perf_counter()
+            try:
+                if path == "pipeline":
+                    await handle_meal(app, user_id, meal)
+                else:
+                    await app.ainvoke(
+                        {"messages": [{"role": "user", "content": meal}]},
+                        config=conversation_config(app, user_id), **run_options(app),
+                    )
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    calls_before, queries_before = model.stats["calls"], counter.total
+    started = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - started
+
+    turn_count = sessions * turns
+    return {
+        "sessions": sessions,
+        "turns": turn_count,
+        "errors": errors,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "model_calls_per_turn": round((model.stats["calls"] - calls_before) / turn_count, 3),
+        "db_queries_per_turn": round((counter.total - queries_before) / turn_count, 3),
+        "turns_per_second": round(turn_count / elapsed, 2),
+    }
+
+
+# --- Results ---
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _save(report: dict) -> Path:
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    previous = sorted(RESULTS_DIR.glob("*.json"))
+    path = RESULTS_DIR / f"{report['started_at'].replace(':', '').replace('-', '')}.json"
+    path.write_text(json.dumps(report, indent=2))
+    if previous:
+        _compare(json.loads(previous[-1].read_text()), report, previous[-1].name)
+    return path
+
+
+def _compare(old: dict, new: dict, old_name: str):
+    old_levels = {level["sessions"]: level for level in old.get("levels", [])}
+    print(f"\nCompared with {old_name} (commit {old.get('commit')}):")
+    for level in new["levels"]:
+        before = old_levels.get(level["sessions"])
+        if before is None:
+            continue
+        changes = ", ".join(
+            f"{key} {before[key]} -> {level[key]}"
+            for key in ("p50_ms", "p95_ms", "model_calls_per_turn", "db_queries_per_turn", "turns_per_second")
+        )
+        print(f"  {level['sessions']:>4} sessions: {changes}")
+
+
+def _print_table(levels):
+    header = f"{'sessions':>8} {'turns':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'model/turn':>10} {'db/turn':>8} {'turns/s':>8}"
+    print(header)
+    print("-" * len(header))
+    for level in levels:
+        print(
+            f"{level['sessions']:>8} {level['turns']:>6} {level['errors']:>6} {level['p50_ms']:>9} {level['p95_ms']:>9} "
+            f"{level['model_calls_per_turn']:>10} {level['db_queries_per_turn']:>8} {level['turns_per_second']:>8}"
+        )
+
+
+# --- Entry Point ---
+async def run(args):
+    database = f"aarogya_bench_{uuid.uuid4().hex[:8]}"
+    tavily = LocalTavilyServer(latency_seconds=args.search_latency).start()
+    # Must be in place before any app module imports core.config.
+    os.environ["DATABASE_URL"] = _server_url().set(database=database).render_as_string(hide_password=False)
+    os.environ["TAVILY_BASE_URL"] = tavily.url
+    os.environ.setdefault("TAVILY_API_KEY", "bench")
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    await _admin(f'CREATE DATABASE "{database}"')
+    try:
+        from db.database import engine, setup_database
+        from db.food_catalog import food_catalog
+        from agents.food_agent import build_agent_graph
+        from db.checkpointer import PostgresCheckpointSaver
+        from bench.scripted_model import ScriptedChatModel
+        from tools.web_search import close_http_client
+
+        await setup_database()
+        await _seed(engine)
+        await food_catalog.load()
+
+        model = ScriptedChatModel(latency_seconds=args.model_latency)
+        app = build_agent_graph(chat_model=model, checkpointer=PostgresCheckpointSaver(engine))
+        counter = QueryCounter(engine)
+
+        levels = []
+        for n, sessions in enumerate(args.sessions):
+            levels.append(await _run_level(app, sessions, args.turns, args.path, model, counter, user_offset=n * 10_000))
+
+        from core.metrics import metrics
+        # Per-node, per-tool and per-statement breakdown when run with METRICS_ENABLED=true.
+        breakdown = metrics.snapshot() if metrics.enabled else None
+
+        await close_http_client()
+        await engine.dispose()
+    finally:
+        tavily.stop()
+        await _admin(f'DROP DATABASE IF EXISTS "{database}" WITH (FORCE)')
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "args": {key: value for key, value in vars(args).items()},
+        "search_requests": len(tavily.requests),
+        "levels": levels,
+        "metrics": breakdown,
+    }
+    _print_table(levels)
+    if not args.no_save:
+        print(f"\nSaved {_save(report)}")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the Aarogya agent.")
+    parser.add_argument("--sessions", default="1,8,32", type=lambda s: [int(n) for n in s.split(",")],
+                        help="Comma-separated concurrency levels to run.")
+    parser.add_argument("--turns", type=int, default=5, help="Meals logged by each session.")
+    parser.add_argument("--path", choices=["pipeline", "agent"], default="pipeline",
+                        help="pipeline: cache + fast path + agent, as served; agent: every meal through the graph.")
+    parser.add_argument("--model-latency", type=float, default=0.0, help="Seconds the scripted model sleeps per call.")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Seconds the search stand-in sleeps per request.")
+    parser.add_argument("--no-save", action="store_true", help="Print results without writing bench/results.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(_parse_args()))
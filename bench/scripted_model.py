@@ -0,0 +1,136 @@
+import asyncio
+import json
+import re
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+from agents.fast_path import parse_meal
+
+# Fallback macros for a web result the parser can't read, per serving.
+DEFAULT_MACROS = {"serving_weight_grams": 100.0, "calories": 150.0, "protein_grams": 4.0, "carbs_grams": 20.0, "fat_grams": 5.0}
+NUTRIENT_PATTERNS = {
+    "serving_weight_grams": r"(\d+(?:\.\d+)?)\s*g\b",
+    "calories": r"(\d+(?:\.\d+)?)\s*Calories",
+    "fat_grams": r"Fat\s*(\d+(?:\.\d+)?)\s*g",
+    "carbs_grams": r"Carbohydrate\s*(\d+(?:\.\d+)?)\s*g",
+    "protein_grams": r"Protein\s*(\d+(?:\.\d+)?)\s*g",
+}
+
+
+def _macros_from_text(content: str) -> dict:
+    macros = dict(DEFAULT_MACROS)
+    for key, pattern in NUTRIENT_PATTERNS.items():
+        match = re.search(pattern, content)
+        if match:
+            macros[key] = float(match.group(1))
+    return macros
+
+
+def _log_item(name: str, quantity: float, unit: Optional[str]) -> dict:
+    return {"food_name": name, "quantity": quantity, "unit": unit}
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    A deterministic stand-in for the OpenAI model that follows the system prompt's workflow:
+    batch search, web search for misses, add + batch log, then a plain-text summary.
+    Its next step is derived purely from the message history, so it is safe to share across sessions.
+    """
+
+    latency_seconds: float = 0.0
+    # Mutable counters shared by every copy of the model; read them via `stats`.
+    stats: dict = Field(default_factory=lambda: {"calls": 0, "prompt_chars": 0})
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next_message(self, messages: List[BaseMessage]) -> AIMessage:
+        # Earlier turns in the thread are history; the script only acts on the latest request.
+        start = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        messages = messages[start:]
+        meal = str(messages[0].content).rsplit("Log only:", 1)[-1].rstrip(")").strip()
+        items = parse_meal(meal) or []
+        ai_messages = [m for m in messages if isinstance(m, AIMessage)]
+        results = {m.tool_call_id: str(m.content) for m in messages if isinstance(m, ToolMessage)}
+        call_id = f"call_{len(ai_messages)}_{{}}"
+
+        if not ai_messages:
+            return AIMessage(content="", tool_calls=[{
+                "name": "search_food_database_batch", "args": {"food_names": [i.food for i in items]}, "id": call_id.format(0),
+            }])
+
+        last_calls = ai_messages[-1].tool_calls
+        last_names = {call["name"] for call in last_calls}
+        if last_names & {"log_food_to_database", "log_foods_to_database"} or not last_calls:
+            return AIMessage(content=f"Logged your meal: {meal}.")
+
+        # Everything the batch search found, keyed by the requested name.
+        found = {}
+        for message in ai_messages:
+            for call in message.tool_calls:
+                if call["name"] == "search_food_database_batch":
+                    for name, data in json.loads(results.get(call["id"], "{}")).items():
+                        if "error" not in data:
+                            found[name] = data
+
+        if last_names == {"search_food_database_batch"}:
+            missing = [i.food for i in items if i.food not in found]
+            if missing:
+                return AIMessage(content="", tool_calls=[
+                    {"name": "search_internet_for_nutrition", "args": {"food_name": name}, "id": call_id.format(n)}
+                    for n, name in enumerate(missing)
+                ])
+
+        calls, log_items = [], []
+        web = {call["args"]["food_name"]: results.get(call["id"], "") for call in last_calls if call["name"] == "search_internet_for_nutrition"}
+        for item in items:
+            if item.food in found:
+                data = found[item.food]
+                log_items.append(_log_item(data["name"], item.quantity, item.unit))
+            elif item.food in web and not web[item.food].startswith("Error"):
+                macros = _macros_from_text(web[item.food])
+                calls.append({
+                    "name": "add_new_food_to_database", "id": call_id.format(len(calls)),
+                    # Gram amounts are converted through serving_weight_grams, so they don't become the serving unit.
+                    "args": {"name": item.food, "serving_unit": "serving" if item.unit in (None, "g", "kg") else item.unit, **macros},
+                })
+                log_items.append(_log_item(item.food, item.quantity, item.unit))
+        if log_items:
+            calls.append({"name": "log_foods_to_database", "args": {"items": log_items}, "id": call_id.format(len(calls))})
+        if not calls:
+            return AIMessage(content=f"I couldn't find nutrition data for: {meal}.")
+        return AIMessage(content="", tool_calls=calls)
+
+    def _record(self, messages: List[BaseMessage]) -> ChatResult:
+        self.stats["calls"] += 1
+        self.stats["prompt_chars"] += sum(len(str(m.content)) for m in messages)
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        return self._record(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        return self._record(messages)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs):
+        # Streams the summary word by word, like the real model, so streaming front ends can be exercised offline.
+        message = (await self._agenerate(messages)).generations[0].message
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": n}
+                for n, call in enumerate(message.tool_calls)
+            ]))
+            return
+        for word in re.findall(r"\S+\s*", message.content):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                await run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
@@ -0,0 +1,373 @@
+"""
+Workload capture and replay: turns real sessions recorded in logs/app.log into a workload file,
+then replays it against a throwaway database with the scripted model and the local Tavily
+stand-in, so schema, index and cache changes are measured on production meal mixes.
+
+    python -m bench.workload capture logs/app.log logs/app.log.2026-10-16 -o workload.jsonl
+    python -m bench.workload replay workload.jsonl --speedup 20 --concurrency 16
+    python -m bench.workload replay workload.jsonl --path tools --speedup 0 --copies 10
+
+Capture reads both log formats. JSON lines written with WORKLOAD_CAPTURE=true carry one
+"aarogya.workload" record per turn with the user's exact words, and tool calls tagged with the
+user id. Other logs (plain-text ones, or JSON written with capture off) only have the model's
+tool calls; their turns are rebuilt from the "Calling model..." / "Model requested tool calls"
+sequence, with the meal text recovered from the logged (or else searched) items, and each
+process run counts as one user.
+
+Replay keeps each user's turns in order and on the recorded schedule, divided by --speedup, with
+idle gaps capped at --max-gap; at most --concurrency turns run at once. --path picks what a turn
+runs: the served pipeline, the agent graph, or the recorded tool calls straight against the
+tools. Needs a reachable Postgres server, as bench/run.py does.
+"""
+import argparse
+import ast
+import asyncio
+import json
+import os
+import re
+import statistics
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from bench.run import QueryCounter, _admin, _git_commit, _percentile, _seed, _server_url
+from devtools.local_tavily import LocalTavilyServer
+
+# --- Configuration ---
+# Longest pause between turns replayed as-is (in recorded seconds); overnight gaps aren't load.
+DEFAULT_MAX_GAP_SECONDS = 30.0
+PATHS = ("pipeline", "agent", "tools")
+
+PLAIN_LINE = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) - (\S+) - (\w+) - (.*)$")
+TOOL_CALLS_PREFIX = "Agent: Model requested tool calls: "
+CALLING_MODEL = "Agent: Calling model..."
+SYSTEM_MARKERS = ("--- System Initializing ---", "--- System Shutting Down ---")
+
+
+# --- Capture ---
+def _read_records(paths):
+    """Yields (timestamp, message, extra fields) from plain-text or JSON-line app logs; other lines are skipped."""
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as log:
+            for line in log:
+                if line.startswith("{"):
+                    try:
+                        record = json.loads(line)
+                        yield datetime.fromisoformat(record["ts"]).timestamp(), record.get("msg", ""), record
+                    except (ValueError, KeyError):
+                        continue
+                    continue
+                match = PLAIN_LINE.match(line.rstrip("\n"))
+                if match:
+                    # Tracebacks and other continuation lines don't match and are dropped.
+                    stamp = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S,%f")
+                    yield stamp.timestamp(), match.group(4), {}
+
+
+def _tool_calls(message: str, fields: dict) -> list:
+    calls = fields.get("tool_calls")
+    if calls is None:
+        try:
+            # The message holds the calls' Python repr, not JSON.
+            calls = ast.literal_eval(message[len(TOOL_CALLS_PREFIX):])
+        except (ValueError, SyntaxError):
+            return []
+    return [_current_call(call["name"], dict(call.get("args") or {})) for call in calls]
+
+
+def _current_portion(item: dict) -> dict:
+    # Logging tools used to take the model's own macros and `item_name`; the tool now computes them from a name and amount.
+    return {"food_name": item.get("food_name") or item.get("item_name"), "quantity": item.get("quantity", 1), "unit": item.get("unit")}
+
+
+def _current_call(name: str, args: dict) -> dict:
+    if name == "log_food_to_database":
+        args = _current_portion(args)
+    elif name == "log_foods_to_database":
+        args = {"items": [_current_portion(item) for item in args.get("items", [])]}
+    elif name == "search_internet_for_nutrition" and "query" in args:
+        # It used to take a free-text query; the tool now builds the query from the food name.
+        args = {"food_name": args["query"]}
+    return {"name": name, "args": args}
+
+
+def _amount(quantity) -> str:
+    return f"{float(quantity):g}"
+
+
+def meal_text(tool_calls: list) -> str:
+    """What the user most likely typed, rebuilt from what the model logged or, failing that, searched for."""
+    portions = []
+    for call in tool_calls:
+        if call["name"] == "log_food_to_database":
+            portions.append(call["args"])
+        elif call["name"] == "log_foods_to_database":
+            portions.extend(call["args"]["items"])
+    if portions:
+        # The model repeats a logging call whose first attempt failed; that is one portion, not two.
+        return ", ".join(dict.fromkeys(" ".join(filter(None, (_amount(p["quantity"]), p["unit"], p["food_name"]))) for p in portions))
+    names = []
+    for call in tool_calls:
+        if call["name"] == "search_food_database":
+            names.append(call["args"].get("food_name"))
+        elif call["name"] == "search_food_database_batch":
+            names.extend(call["args"].get("food_names", []))
+    # The local search comes first and uses the user's names; web queries are the model's rewording.
+    if not names:
+        names = [call["args"].get("food_name") for call in tool_calls if call["name"] == "search_internet_for_nutrition"]
+    return ", ".join(dict.fromkeys(filter(None, names)))
+
+
+def capture(paths) -> list:
+    """
+    Parses app logs into turns: {"offset": seconds since the first turn, "user": ..., "meal": ...,
+    "tool_calls": [{"name", "args"}]}, in arrival order.
+    """
+    records = list(_read_records(paths))
+    structured = any("meal" in fields for _, _, fields in records)
+    turns = []
+
+    if structured:
+        open_turns, last = {}, None
+        for ts, message, fields in records:
+            if "meal" in fields:
+                last = open_turns[fields.get("user_id")] = {"ts": ts, "user": fields.get("user_id"), "meal": fields["meal"], "tool_calls": []}
+                turns.append(last)
+            elif message.startswith(TOOL_CALLS_PREFIX):
+                # Untagged calls (a log from before the tagging) belong to the latest turn.
+                turn = open_turns.get(fields.get("user_id"), last)
+                if turn is not None:
+                    turn["tool_calls"] += _tool_calls(message, fields)
+    else:
+        run, turn, answered = 0, None, False
+
+        def close():
+            # A turn whose model never called a tool was a question, not a meal; there's nothing to replay.
+            if turn and turn["tool_calls"]:
+                turn["meal"] = meal_text(turn["tool_calls"])
+                if turn["meal"]:
+                    turns.append(turn)
+
+        for ts, message, fields in records:
+            if message.startswith(SYSTEM_MARKERS):
+                close()
+                turn, answered = None, False
+                if message.startswith(SYSTEM_MARKERS[0]):
+                    run += 1
+            elif message.startswith(CALLING_MODEL):
+                # A model call after one that answered in plain text starts the next turn.
+                if turn is not None and answered:
+                    close()
+                    turn = None
+                if turn is None:
+                    turn = {"ts": ts, "user": f"run-{run}", "tool_calls": []}
+                answered = True
+            elif message.startswith(TOOL_CALLS_PREFIX) and turn is not None:
+                turn["tool_calls"] += _tool_calls(message, fields)
+                answered = False
+        close()
+
+    turns.sort(key=lambda t: t["ts"])
+    first = turns[0]["ts"] if turns else 0
+    return [{"offset": round(t["ts"] - first, 3), "user": t["user"], "meal": t["meal"], "tool_calls": t["tool_calls"]} for t in turns]
+
+
+def save_workload(turns: list, path: Path):
+    with path.open("w", encoding="utf-8") as out:
+        for turn in turns:
+            out.write(json.dumps(turn, ensure_ascii=False) + "\n")
+
+
+def load_workload(path: Path) -> list:
+    with path.open(encoding="utf-8") as workload:
+        return [json.loads(line) for line in workload if line.strip()]
+
+
+# --- Replay ---
+def schedule(turns: list, speedup: float, max_gap: float) -> list:
+    """Due times (seconds from the start of the replay) for turns in offset order; speedup 0 means all at once."""
+    due, previous, current = [], None, 0.0
+    for turn in turns:
+        if previous is not None and speedup:
+            current += min(turn["offset"] - previous, max_gap) / speedup
+        previous = turn["offset"]
+        due.append(current)
+    return due
+
+
+def _turn_runner(app, path: str):
+    from agents.food_agent import tools
+    from agents.pipeline import conversation_config, handle_meal, run_options
+
+    tools_by_name = {t.name: t for t in tools}
+
+    async def run_turn(user_id: int, turn: dict):
+        if path == "pipeline":
+            await handle_meal(app, user_id, turn["meal"])
+        elif path == "agent":
+            await app.ainvoke({"messages": [{"role": "user", "content": turn["meal"]}]},
+                              config=conversation_config(app, user_id), **run_options(app))
+        else:
+            config = {"configurable": {"user_id": user_id}}
+            for call in turn["tool_calls"]:
+                if call["name"] in tools_by_name:
+                    # Tools report failures as text, like the model sees them; only a raised error counts.
+                    await tools_by_name[call["name"]].ainvoke(call["args"], config=config)
+    return run_turn
+
+
+async def replay(app, turns: list, run_turn, speedup: float, concurrency: int, max_gap: float, copies: int, model, counter) -> dict:
+    from agents.pipeline import ensure_user
+    from agents.response_cache import response_cache
+
+    # Each recorded user becomes `copies` bench users, all on the same schedule.
+    users = {user: n for n, user in enumerate(dict.fromkeys(t["user"] for t in turns))}
+    sessions = defaultdict(list)
+    for due, turn in zip(schedule(turns, speedup, max_gap), turns):
+        for copy in range(copies):
+            sessions[copy * len(users) + users[turn["user"]] + 1].append((due, turn))
+
+    response_cache.clear()
+    limiter = asyncio.Semaphore(concurrency)
+    latencies, lags, errors = [], [], 0
+
+    async def session(user_id: int, due_turns: list):
+        nonlocal errors
+        await ensure_user(user_id)
+        for due, turn in due_turns:
+            await asyncio.sleep(max(0.0, started + due - time.perf_counter()))
+            async with limiter:
+                turn_started = time.perf_counter()
+                # How far behind the recorded schedule the turn got going: the replay is saturated when this grows.
+                lags.append(turn_started - (started + due))
+                try:
+                    await run_turn(user_id, turn)
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - turn_started)
+
+    calls_before, queries_before = model.stats["calls"], counter.total
+    started = time.perf_counter()
+    await asyncio.gather(*(session(user_id, due_turns) for user_id, due_turns in sessions.items()))
+    elapsed = time.perf_counter() - started
+
+    turn_count = len(latencies)
+    return {
+        "users": len(sessions),
+        "turns": turn_count,
+        "errors": errors,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "p95_lag_ms": round(_percentile(lags, 0.95) * 1000, 2),
+        "model_calls_per_turn": round((model.stats["calls"] - calls_before) / turn_count, 3),
+        "db_queries_per_turn": round((counter.total - queries_before) / turn_count, 3),
+        "turns_per_second": round(turn_count / elapsed, 2),
+        "seconds": round(elapsed, 2),
+    }
+
+
+async def run_replay(args):
+    turns = load_workload(args.workload)
+    if args.path == "tools":
+        turns = [t for t in turns if t["tool_calls"]]
+    turns = turns[:args.limit] if args.limit else turns
+    if not turns:
+        raise SystemExit(f"No turns to replay in {args.workload}.")
+
+    database = f"aarogya_replay_{uuid.uuid4().hex[:8]}"
+    tavily = LocalTavilyServer(latency_seconds=args.search_latency).start()
+    # Must be in place before any app module imports core.config.
+    os.environ["DATABASE_URL"] = _server_url().set(database=database).render_as_string(hide_password=False)
+    os.environ["TAVILY_BASE_URL"] = tavily.url
+    os.environ.setdefault("TAVILY_API_KEY", "bench")
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    await _admin(f'CREATE DATABASE "{database}"')
+    try:
+        from db.database import engine, setup_database
+        from db.food_catalog import food_catalog
+        from agents.food_agent import build_agent_graph
+        from db.checkpointer import PostgresCheckpointSaver
+        from bench.scripted_model import ScriptedChatModel
+        from tools.web_search import close_http_client
+
+        await setup_database()
+        await _seed(engine)
+        await food_catalog.load()
+
+        model = ScriptedChatModel(latency_seconds=args.model_latency)
+        app = build_agent_graph(chat_model=model, checkpointer=PostgresCheckpointSaver(engine))
+        counter = QueryCounter(engine)
+        result = await replay(app, turns, _turn_runner(app, args.path), args.speedup, args.concurrency,
+                              args.max_gap, args.copies, model, counter)
+
+        from core.metrics import metrics
+        breakdown = metrics.snapshot() if metrics.enabled else None
+
+        await close_http_client()
+        await engine.dispose()
+    finally:
+        tavily.stop()
+        await _admin(f'DROP DATABASE IF EXISTS "{database}" WITH (FORCE)')
+
+    print(f"{'users':>6}{'turns':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'lag p95':>9}{'model/turn':>11}{'db/turn':>9}{'turns/s':>9}")
+    print(f"{result['users']:>6}{result['turns']:>7}{result['errors']:>8}{result['p50_ms']:>9}{result['p95_ms']:>9}{result['max_ms']:>9}"
+          f"{result['p95_lag_ms']:>9}{result['model_calls_per_turn']:>11}{result['db_queries_per_turn']:>9}{result['turns_per_second']:>9}")
+    if args.output:
+        report = {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "args": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+            "search_requests": len(tavily.requests),
+            "result": result,
+            "metrics": breakdown,
+        }
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nSaved {args.output}")
+
+
+def run_capture(args):
+    turns = capture(args.logs)
+    save_workload(turns, args.output)
+    print(json.dumps({
+        "turns": len(turns),
+        "users": len({t["user"] for t in turns}),
+        "tool_calls": sum(len(t["tool_calls"]) for t in turns),
+        "span_seconds": turns[-1]["offset"] if turns else 0,
+        "output": str(args.output),
+    }))
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Capture workloads from app logs and replay them offline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    capture_args = commands.add_parser("capture", help="Parse app logs into a workload file.")
+    capture_args.add_argument("logs", nargs="+", type=Path, help="Log files, oldest first (rotated files included).")
+    capture_args.add_argument("-o", "--output", type=Path, default=Path("workload.jsonl"))
+
+    replay_args = commands.add_parser("replay", help="Replay a workload file against a throwaway database.")
+    replay_args.add_argument("workload", type=Path)
+    replay_args.add_argument("--path", choices=PATHS, default="pipeline",
+                             help="pipeline: as served; agent: every meal through the graph; tools: the recorded tool calls only.")
+    replay_args.add_argument("--speedup", type=float, default=1.0, help="Divides the recorded gaps; 0 replays as fast as concurrency allows.")
+    replay_args.add_argument("--concurrency", type=int, default=8, help="Turns in flight at once.")
+    replay_args.add_argument("--max-gap", type=float, default=DEFAULT_MAX_GAP_SECONDS, help="Cap on a recorded gap between turns, in seconds.")
+    replay_args.add_argument("--copies", type=int, default=1, help="Replay every recorded user this many times, as distinct users.")
+    replay_args.add_argument("--limit", type=int, help="Replay only the first N turns.")
+    replay_args.add_argument("--model-latency", type=float, default=0.0, help="Seconds the scripted model sleeps per call.")
+    replay_args.add_argument("--search-latency", type=float, default=0.0, help="Seconds the search stand-in sleeps per request.")
+    replay_args.add_argument("--output", type=Path, help="Also write the report as JSON here.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    if args.command == "capture":
+        run_capture(args)
+    else:
+        asyncio.run(run_replay(args))
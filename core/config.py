@@ -7,6 +7,14 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
+# Point OPENAI_BASE_URL at a local stand-in (devtools/local_openai.py) to run without the real service.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Web Search
+# Point TAVILY_BASE_URL at a local stand-in (devtools/local_tavily.py) to run without the real service.
+TAVILY_BASE_URL = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com")
+WEB_SEARCH_CACHE_TTL_HOURS = int(os.getenv("WEB_SEARCH_CACHE_TTL_HOURS", "168"))
+
 # Database Configuration
 DB_USER = os.getenv("POSTGRES_USER")
 DB_PASSWORD = os.getenv("POSTGRES_PASSWORD")
@@ -14,5 +22,56 @@ DB_NAME = os.getenv("POSTGRES_DB")
 DB_HOST = os.getenv("POSTGRES_HOST")
 DB_PORT = os.getenv("POSTGRES_PORT")
 
-# Use the asyncpg driver in the connection string
-DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
\ No newline at end of file
+# Use the asyncpg driver in the connection string.
+# DATABASE_URL, when set, wins; the benchmark harness uses it to point at a throwaway database.
+DATABASE_URL = os.getenv("DATABASE_URL") or f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Connection pool sizing. The pool is shared by every concurrent session in the process,
+# so size it for the serving mode's peak concurrency rather than the single-user REPL.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Connections opened ahead of the first request during startup warmup.
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", str(min(DB_POOL_SIZE, 4))))
+
+# Upper bound on concurrent outbound LLM calls per process; extra sessions wait their turn.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# Serving mode (python main.py --serve)
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+
+# Downloads served at once by GET /users/{user_id}/logs. Each holds a pooled connection for as long as
+# the client takes to read, so keep this well under DB_POOL_SIZE; extra requests get 429.
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "2"))
+
+# Replayed meal cache (agents/response_cache.py)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Latency instrumentation (core/metrics.py). Off by default; when off no hooks are installed.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+# Seconds between metric snapshots written to the log; 0 disables the dump (GET /metrics still works when serving).
+METRICS_DUMP_SECONDS = float(os.getenv("METRICS_DUMP_SECONDS", "0"))
+
+# Workload capture (bench/workload.py): logs each turn's raw user text at INFO. Off by default, since
+# the log files are kept for weeks; turn it on only for the window you mean to capture.
+WORKLOAD_CAPTURE = os.getenv("WORKLOAD_CAPTURE", "false").lower() in ("1", "true", "yes")
+
+# Conversation memory (agents/compaction.py): approximate token ceiling for the history sent to the model,
+# on top of the fixed system prompt. Older turns are condensed, then dropped, to stay under it.
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "2000"))
+
+# Outbound calls (core/resilience.py). Each attempt gets the timeout; the deadline caps all attempts together.
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "20"))
+OPENAI_DEADLINE_SECONDS = float(os.getenv("OPENAI_DEADLINE_SECONDS", "45"))
+OPENAI_RETRIES = int(os.getenv("OPENAI_RETRIES", "2"))
+# Seconds before a duplicate request races a slow one; 0 disables. Off for the model by default: it doubles token spend.
+OPENAI_HEDGE_SECONDS = float(os.getenv("OPENAI_HEDGE_SECONDS", "0"))
+TAVILY_TIMEOUT_SECONDS = float(os.getenv("TAVILY_TIMEOUT_SECONDS", "8"))
+TAVILY_DEADLINE_SECONDS = float(os.getenv("TAVILY_DEADLINE_SECONDS", "15"))
+TAVILY_RETRIES = int(os.getenv("TAVILY_RETRIES", "2"))
+TAVILY_HEDGE_SECONDS = float(os.getenv("TAVILY_HEDGE_SECONDS", "2.5"))
+# Consecutive failed calls that open a provider's circuit, and how long it stays open before a trial call.
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
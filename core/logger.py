@@ -1,32 +1,92 @@
+import atexit
+import copy
+import json
 import logging
-import sys
 import os
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 
 # --- Configuration ---
-LOG_DIR = "logs"
+# Tools that drive the app outside normal use (bench/faults.py) point this elsewhere to keep logs/app.log clean.
+LOG_DIR = os.getenv("LOG_DIR", "logs")
 LOG_FILE = os.path.join(LOG_DIR, "app.log")
-LOG_LEVEL = logging.INFO
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Per-component overrides, e.g. LOG_LEVELS="aarogya.payload=WARNING,httpx=WARNING".
+# aarogya.payload carries the full tool-call and search-result dumps; turning it off keeps
+# every error and warning from the other components.
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+
+# Attributes every LogRecord has; anything else on a record came in through `extra=` and is emitted as a field.
+_STANDARD_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message, any `extra=` fields and the traceback."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        elif record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Enqueues records for the listener thread, which does the formatting and the disk I/O. The message
+    and any `extra=` values are captured at the call, though: the args and extras are often live
+    objects (agent state, tool calls) that the event loop keeps mutating after the call returns.
+    A traceback is rendered up front too, because the frames it refers to won't outlive the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_FIELDS:
+                # A JSON round trip is a deep copy that JsonFormatter is guaranteed to be able to encode.
+                setattr(record, key, json.loads(json.dumps(value, default=str, ensure_ascii=False)))
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def get_logger(component: str) -> logging.Logger:
+    """Logger for one part of the app (e.g. "tools", "agent", "payload"), tunable through LOG_LEVELS."""
+    return logging.getLogger(f"aarogya.{component}")
+
+
+def _apply_component_levels(spec: str):
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
 
 # --- Create logs directory if it doesn't exist ---
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
-# --- Create Logger ---
-# We get the root logger so that all modules inherit this configuration
-logger = logging.getLogger()
-logger.setLevel(LOG_LEVEL)
-
 # --- Create Console Handler ---
 # This handler prints logs to the console
 console_handler = logging.StreamHandler(sys.stdout)
 console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-logger.addHandler(console_handler)
 
 # --- Create Rotating File Handler ---
-# This handler writes logs to a file, rotating it daily.
-# It will keep the last 7 days of logs.
+# This handler writes JSON lines to a file, rotating it daily.
+# It will keep the last 30 days of logs.
 file_handler = TimedRotatingFileHandler(
     filename=LOG_FILE,
     when="midnight",      # Rotate at midnight
@@ -34,5 +94,17 @@ file_handler = TimedRotatingFileHandler(
     backupCount=30,        # Keep 30 old log files
     encoding="utf-8"
 )
-file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-logger.addHandler(file_handler)
\ No newline at end of file
+file_handler.setFormatter(JsonFormatter())
+
+# --- Wire the root logger to a background listener ---
+# We get the root logger so that all modules inherit this configuration
+log_queue = queue.SimpleQueue()
+logger = logging.getLogger()
+logger.setLevel(LOG_LEVEL)
+logger.addHandler(DeferredQueueHandler(log_queue))
+_apply_component_levels(LOG_LEVELS)
+
+listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+listener.start()
+# Flushes whatever is still queued when the process exits.
+atexit.register(listener.stop)
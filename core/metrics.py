@@ -0,0 +1,243 @@
+import asyncio
+import bisect
+import re
+import time
+from contextlib import nullcontext
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from core.config import METRICS_ENABLED
+from core.logger import get_logger
+
+logger = get_logger("metrics")
+
+# --- Configuration ---
+# Upper bounds in seconds; one more bucket catches everything slower.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_NULL_SPAN = nullcontext()
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+([a-z_][a-z0-9_]*)", re.IGNORECASE)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; quantiles are estimated as the upper bound of their bucket (capped at the max seen)."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        rank, seen = q * self.count, 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.50) * 1000, 2),
+            "p95_ms": round(self.quantile(0.95) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class _Span:
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry, name: str, labels: dict):
+        self.registry, self.name, self.labels = registry, name, labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, time.perf_counter() - self.started, status="error" if exc_type else "ok", **self.labels)
+
+
+class MetricsRegistry:
+    """
+    In-process latency histograms and counters, keyed by metric name plus labels.
+    Everything here runs on the event loop thread, so no locking is needed. When disabled,
+    `span()` hands back a shared no-op context and no hooks are installed anywhere.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._histograms = {}
+        self._counters = {}
+        self.callback_handler = MetricsCallbackHandler(self)
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def incr(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def span(self, name: str, **labels):
+        """Times the enclosed block into histogram `name`: `with metrics.span("fast_path_seconds"): ...`"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, labels)
+
+    def callbacks(self) -> list:
+        """LangChain callbacks for a graph run: node, tool and model timings plus token counts."""
+        return [self.callback_handler] if self.enabled else []
+
+    def httpx_hooks(self) -> dict:
+        """`event_hooks` for an httpx.AsyncClient that time each outbound request."""
+        if not self.enabled:
+            return {}
+
+        async def on_request(request):
+            request.extensions["metrics_started"] = time.perf_counter()
+
+        async def on_response(response):
+            started = response.request.extensions.get("metrics_started")
+            if started is not None:
+                # Time to response headers; bodies here are small JSON documents.
+                self.observe("http_request_seconds", time.perf_counter() - started,
+                             host=response.request.url.host, status=str(response.status_code))
+
+        return {"request": [on_request], "response": [on_response]}
+
+    def instrument_engine(self, engine):
+        """Times every SQL statement sent through `engine`, labelled by verb and table."""
+        if not self.enabled:
+            return
+        from sqlalchemy import event
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            context._metrics_started = time.perf_counter()
+
+        def after_execute(conn, cursor, statement, parameters, context, executemany):
+            self.observe("db_statement_seconds", time.perf_counter() - context._metrics_started,
+                         statement=statement_label(statement))
+
+        event.listen(engine.sync_engine, "before_cursor_execute", before_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", after_execute)
+
+    def snapshot(self) -> dict:
+        histograms, counters = {}, {}
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            histograms.setdefault(name, []).append({"labels": dict(labels), **histogram.as_dict()})
+        for (name, labels), value in sorted(self._counters.items()):
+            counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+        return {"uptime_seconds": round(time.time() - self.started_at, 1), "histograms": histograms, "counters": counters}
+
+    def render_prometheus(self) -> str:
+        """The Prometheus text exposition format, served on GET /metrics."""
+        lines = []
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for (name, labels), value in sorted(self._counters.items()):
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        self._histograms.clear()
+        self._counters.clear()
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Turns LangChain run events into histograms: graph nodes, tool calls and chat model calls."""
+
+    # Called directly on the event loop rather than through a thread pool; every hook is a dict operation.
+    run_inline = True
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self._runs = {}    # run_id -> (metric name, labels, start time)
+
+    def _start(self, run_id: UUID, name: str, **labels):
+        self._runs[run_id] = (name, labels, time.perf_counter())
+
+    def _finish(self, run_id: UUID, status: str):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            name, labels, started = run
+            self.registry.observe(name, time.perf_counter() - started, status=status, **labels)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # Each node run is named after its node; the router and other inner runnables are not.
+        if node is not None and kwargs.get("name") == node:
+            self._start(run_id, "graph_node_seconds", node=node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id, "ok")
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool_seconds", tool=(serialized or {}).get("name") or kwargs.get("name", "unknown"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._finish(run_id, "ok")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        self._start(run_id, "llm_call_seconds", model=params.get("model_name") or params.get("model") or "unknown")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, "ok")
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.registry.incr("llm_tokens_total", usage.get("input_tokens", 0), kind="input")
+                    self.registry.incr("llm_tokens_total", usage.get("output_tokens", 0), kind="output")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
+
+
+def statement_label(statement: str) -> str:
+    """A low-cardinality name for a SQL statement, e.g. "SELECT indian_food_items"."""
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "?"
+    table = _TABLE_PATTERN.search(statement)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+async def dump_periodically(interval_seconds: float):
+    """Writes a snapshot to the metrics log every `interval_seconds`, for runs without the HTTP server."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        logger.info("Metrics snapshot.", extra={"metrics": metrics.snapshot()})
+
+
+metrics = MetricsRegistry(METRICS_ENABLED)
@@ -0,0 +1,192 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional
+from core.config import (
+    OPENAI_TIMEOUT_SECONDS, OPENAI_DEADLINE_SECONDS, OPENAI_RETRIES, OPENAI_HEDGE_SECONDS,
+    TAVILY_TIMEOUT_SECONDS, TAVILY_DEADLINE_SECONDS, TAVILY_RETRIES, TAVILY_HEDGE_SECONDS,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS,
+)
+from core.logger import get_logger
+from core.metrics import metrics
+
+logger = get_logger("resilience")
+
+# --- Configuration ---
+BACKOFF_BASE_SECONDS = 0.25
+BACKOFF_MAX_SECONDS = 4.0
+# HTTP statuses worth retrying: the provider is overloaded or briefly unavailable, not rejecting the request.
+TRANSIENT_STATUSES = {408, 409, 425, 429}
+# Exception class names from provider SDKs that mean "couldn't reach it"; matched by name so the SDKs stay lazy imports.
+TRANSIENT_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "ConnectTimeout",
+                    "RemoteProtocolError", "ReadError", "WriteError", "PoolTimeout"}
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider's circuit is open or a call used up its attempts or deadline."""
+
+    def __init__(self, provider: str, message: str):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+
+
+class CircuitOpen(ProviderUnavailable):
+    """Raised without trying when the provider's circuit is open."""
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether a failed call is worth retrying (and counts against the provider's circuit)."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in TRANSIENT_STATUSES or status >= 500
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(exc).__mro__)
+
+
+class CircuitBreaker:
+    """
+    Closed until `failure_threshold` calls in a row fail; then open, rejecting calls immediately,
+    for `reset_seconds`; then half-open, where a single trial call decides whether it closes again.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.reset()
+
+    def reset(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.reset_seconds else "half_open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in the half-open state only the first caller gets through."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open" or self._trial_running:
+            return False
+        self._trial_running = True
+        return True
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("Circuit closed again after a successful trial call.")
+        self.reset()
+
+    def record_failure(self) -> bool:
+        """Counts a failed call; returns True when this failure opened (or re-opened) the circuit."""
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def release_trial(self):
+        # A trial call that was cancelled decided nothing; let the next caller try.
+        self._trial_running = False
+
+
+class ResilientClient:
+    """
+    Wraps every outbound call to one provider: a timeout per attempt, a deadline across attempts,
+    retries with full-jitter backoff for transient failures only, an optional hedge (a duplicate
+    request started once the first is slow, first answer wins) and a circuit breaker that makes
+    calls fail fast while the provider is down. Shared by every session in the process.
+    """
+
+    def __init__(self, name: str, timeout: float, deadline: float, retries: int, hedge_after: float = 0.0,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+
+    @property
+    def available(self) -> bool:
+        """False while the circuit is open: callers can skip the provider without trying."""
+        return self.breaker.state != "open"
+
+    async def call(self, make_request: Callable[[], Awaitable], can_retry: Optional[Callable[[], bool]] = None):
+        """
+        Runs `make_request()` (a fresh awaitable each time) under this client's policy and returns its result.
+        `can_retry` is asked before any second request (a retry or a hedge); a streaming caller returns False
+        once output has reached the user, since another request would stream it again.
+        """
+        can_retry = can_retry or (lambda: True)
+        if not self.breaker.allow():
+            metrics.incr("circuit_rejected_total", provider=self.name)
+            raise CircuitOpen(self.name, "circuit open after repeated failures")
+
+        deadline = time.monotonic() + self.deadline
+        decided = False
+        try:
+            last_error = None
+            for attempt in range(self.retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    result = await asyncio.wait_for(self._attempt(make_request, can_retry), min(self.timeout, remaining))
+                except Exception as e:
+                    if not is_transient(e):
+                        # The provider answered; the request itself was bad. Not the circuit's business.
+                        self.breaker.record_success()
+                        decided = True
+                        raise
+                    last_error = e
+                    logger.warning("%s call failed (attempt %s of %s): %r", self.name, attempt + 1, self.retries + 1, e)
+                    if attempt < self.retries:
+                        if not can_retry():
+                            break
+                        metrics.incr("outbound_retries_total", provider=self.name)
+                        backoff = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                        await asyncio.sleep(min(backoff, max(0.0, deadline - time.monotonic())))
+                    continue
+                self.breaker.record_success()
+                decided = True
+                return result
+
+            decided = True
+            if self.breaker.record_failure():
+                metrics.incr("circuit_opened_total", provider=self.name)
+                logger.error("%s circuit opened; failing fast for %ss.", self.name, self.breaker.reset_seconds)
+            raise ProviderUnavailable(self.name, f"no answer within {self.retries + 1} attempts / {self.deadline}s") from last_error
+        finally:
+            if not decided:
+                self.breaker.release_trial()
+
+    async def _attempt(self, make_request: Callable[[], Awaitable], can_retry: Callable[[], bool]):
+        if not self.hedge_after:
+            return await make_request()
+        tasks = [asyncio.ensure_future(make_request())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done and can_retry():
+                metrics.incr("hedged_requests_total", provider=self.name)
+                tasks.append(asyncio.ensure_future(make_request()))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+openai_client = ResilientClient("openai", OPENAI_TIMEOUT_SECONDS, OPENAI_DEADLINE_SECONDS, OPENAI_RETRIES, OPENAI_HEDGE_SECONDS)
+tavily_client = ResilientClient("tavily", TAVILY_TIMEOUT_SECONDS, TAVILY_DEADLINE_SECONDS, TAVILY_RETRIES, TAVILY_HEDGE_SECONDS)
@@ -0,0 +1,123 @@
+"""
+Portion units: turns "2 katori", "150 g" or "half a cup" of a catalog food into a number of that
+food's servings, using the row's serving_unit and serving_weight_grams, and scales its macros.
+Used by the fast path and by the logging tools, so the model never does the arithmetic.
+"""
+import re
+from typing import List, NamedTuple, Optional
+
+# --- Configuration ---
+# Typical gram weights of household measures, used only when a food's serving is given by weight
+# (e.g. the "100g" rows of an IFCT import); a food served in the same measure converts exactly.
+HOUSEHOLD_GRAMS = {"katori": 150.0, "bowl": 250.0, "plate": 300.0, "glass": 250.0, "cup": 240.0, "tbsp": 15.0, "tsp": 5.0}
+
+# Macro column of an indian_food_items row -> key of a daily_logs item.
+MACRO_COLUMNS = (("calories", "calories"), ("protein_grams", "protein"), ("carbs_grams", "carbs"), ("fat_grams", "fat"))
+
+
+class Unit(NamedTuple):
+    name: str       # canonical singular form, as stored in daily_logs.unit
+    kind: str       # "mass", "volume", "count" or "serving"
+    size: float     # grams for mass, millilitres for volume, 1 otherwise
+
+
+_UNITS = [
+    (Unit("g", "mass", 1.0), ("g", "gm", "gms", "gram", "grams", "gr")),
+    (Unit("kg", "mass", 1000.0), ("kg", "kgs", "kilo", "kilos", "kilogram", "kilograms")),
+    (Unit("ml", "volume", 1.0), ("ml", "mls", "millilitre", "millilitres", "milliliter", "milliliters")),
+    (Unit("l", "volume", 1000.0), ("l", "litre", "litres", "liter", "liters", "ltr")),
+    (Unit("katori", "volume", 150.0), ("katori", "katoris")),
+    (Unit("bowl", "volume", 250.0), ("bowl", "bowls")),
+    (Unit("glass", "volume", 250.0), ("glass", "glasses")),
+    (Unit("cup", "volume", 240.0), ("cup", "cups")),
+    (Unit("tbsp", "volume", 15.0), ("tbsp", "tablespoon", "tablespoons")),
+    (Unit("tsp", "volume", 5.0), ("tsp", "teaspoon", "teaspoons")),
+    (Unit("plate", "count", 1.0), ("plate", "plates")),
+    (Unit("piece", "count", 1.0), ("piece", "pieces", "pc", "pcs")),
+    (Unit("slice", "count", 1.0), ("slice", "slices")),
+    (Unit("serving", "serving", 1.0), ("serving", "servings", "portion", "portions")),
+]
+# Every spelling users (or the model) type -> its Unit.
+UNITS = {alias: unit for unit, aliases in _UNITS for alias in aliases}
+
+_SERVING_PATTERN = re.compile(r"^\s*(?P<amount>\d+(?:\.\d+)?)?\s*(?P<unit>[a-z ]*?)\s*$")
+
+
+def lookup_unit(text: Optional[str]) -> Optional[Unit]:
+    """The Unit for a spelling like "Katoris" or "gms", or None if it isn't one we know."""
+    if not text:
+        return None
+    return UNITS.get(" ".join(text.lower().replace(".", " ").split()))
+
+
+def parse_serving(serving_unit: str):
+    """
+    Splits a catalog serving_unit into (amount, Unit or None): "katori" -> (1, katori),
+    "100g" -> (100, g), "2 pieces" -> (2, piece). Free text like "medium" gives (1, None).
+    """
+    match = _SERVING_PATTERN.match((serving_unit or "").lower())
+    if not match:
+        return 1.0, None
+    amount = float(match.group("amount")) if match.group("amount") else 1.0
+    return (amount or 1.0), lookup_unit(match.group("unit"))
+
+
+def servings(food: dict, quantity: float, unit: Optional[str] = None) -> Optional[float]:
+    """
+    How many of `food`'s servings `quantity` `unit` amounts to, or None when the unit can't be
+    converted safely (e.g. pieces of something served by the katori). No unit means servings.
+    """
+    requested = lookup_unit(unit) if unit else UNITS["serving"]
+    if requested is None:
+        # Not a unit we know, but it may be the catalog's own wording ("medium", "large").
+        return quantity if unit and unit.strip().lower() == (food["serving_unit"] or "").strip().lower() else None
+    if requested.kind == "serving":
+        return quantity
+
+    amount, served_in = parse_serving(food["serving_unit"])
+    serving_grams = food.get("serving_weight_grams")
+    if served_in is not None and served_in.name == requested.name:
+        return quantity / amount
+    if served_in is not None and served_in.kind == requested.kind == "volume":
+        return quantity * requested.size / (amount * served_in.size)
+    if not serving_grams:
+        return None
+    if requested.kind == "mass":
+        return quantity * requested.size / serving_grams
+    if requested.name in HOUSEHOLD_GRAMS and (served_in is None or served_in.kind in ("mass", "serving")):
+        return quantity * HOUSEHOLD_GRAMS[requested.name] / serving_grams
+    return None
+
+
+def scale_meal(foods: List[dict], factors: List[float]) -> List[dict]:
+    """
+    Macros for a whole meal in one pass: food i scaled by factors[i], column by column, returned
+    as one {"calories", "protein", "carbs", "fat"} dict per item (rounded to 0.1).
+    """
+    keys = [key for _, key in MACRO_COLUMNS]
+    columns = [[round((food[column] or 0) * factor, 1) for food, factor in zip(foods, factors)] for column, _ in MACRO_COLUMNS]
+    return [dict(zip(keys, row)) for row in zip(*columns)]
+
+
+def portion_items(portions) -> List[Optional[dict]]:
+    """
+    Turns [(food row, quantity, unit or None)] into daily_logs items with scaled macros, in order.
+    An entry is None where the unit doesn't convert for that food.
+    """
+    factors = [servings(food, quantity, unit) for food, quantity, unit in portions]
+    convertible = [(portion, factor) for portion, factor in zip(portions, factors) if factor is not None]
+    macros = iter(scale_meal([food for (food, _, _), _ in convertible], [factor for _, factor in convertible]))
+
+    items = []
+    for (food, quantity, unit), factor in zip(portions, factors):
+        if factor is None:
+            items.append(None)
+            continue
+        known = lookup_unit(unit)
+        items.append({
+            "food_id": food.get("food_id"), "item_name": food["name"], "quantity": quantity,
+            # The food's own wording for a plain serving count, otherwise the unit the amount was given in.
+            "unit": food["serving_unit"] if known is None or known.kind == "serving" else known.name,
+            **next(macros),
+        })
+    return items
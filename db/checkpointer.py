@@ -0,0 +1,199 @@
+from typing import Any, AsyncIterator, Optional, Sequence
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from sqlalchemy import text
+from db.database import engine
+from core.logger import get_logger
+
+logger = get_logger("db")
+
+# Inserts a checkpoint and, in the same round trip, drops the thread's older ones and their writes.
+# Each checkpoint stores the whole state, so nothing ever needs an ancestor once a newer one exists.
+PUT_CHECKPOINT = text("""
+    WITH saved AS (
+        INSERT INTO graph_checkpoints
+            (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint, metadata_type, metadata)
+        VALUES (:thread_id, :checkpoint_ns, :checkpoint_id, :parent_checkpoint_id, :checkpoint_type, :checkpoint, :metadata_type, :metadata)
+        ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id) DO UPDATE SET
+            checkpoint_type = EXCLUDED.checkpoint_type, checkpoint = EXCLUDED.checkpoint,
+            metadata_type = EXCLUDED.metadata_type, metadata = EXCLUDED.metadata, updated_at = CURRENT_TIMESTAMP
+        RETURNING checkpoint_id
+    ), pruned AS (
+        DELETE FROM graph_checkpoints
+        WHERE thread_id = :thread_id AND checkpoint_ns = :checkpoint_ns AND checkpoint_id < :checkpoint_id
+    )
+    DELETE FROM graph_checkpoint_writes
+    WHERE thread_id = :thread_id AND checkpoint_ns = :checkpoint_ns AND checkpoint_id < :checkpoint_id
+""")
+
+# Special writes (negative idx, e.g. errors and interrupts) replace earlier ones; regular writes are kept once.
+PUT_WRITE = text("""
+    INSERT INTO graph_checkpoint_writes
+        (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, value_type, value, task_path)
+    VALUES (:thread_id, :checkpoint_ns, :checkpoint_id, :task_id, :idx, :channel, :value_type, :value, :task_path)
+    ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id, task_id, idx) DO UPDATE SET
+        channel = EXCLUDED.channel, value_type = EXCLUDED.value_type, value = EXCLUDED.value
+    WHERE graph_checkpoint_writes.idx < 0
+""")
+
+
+class PostgresCheckpointSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer on the app's own asyncpg engine, one conversation thread per user.
+    Only the latest checkpoint of each thread is kept, so storage stays proportional to the
+    (compacted) conversation rather than its history; there is no time travel. Async only.
+    """
+
+    def __init__(self, db_engine=None, *, serde=None):
+        super().__init__(serde=serde)
+        self.engine = db_engine or engine
+
+    @staticmethod
+    def _thread(config: RunnableConfig):
+        configurable = config["configurable"]
+        return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, row, writes) -> CheckpointTuple:
+        parent_id = row["parent_checkpoint_id"]
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": row["checkpoint_id"]}},
+            checkpoint=self.serde.loads_typed((row["checkpoint_type"], row["checkpoint"])),
+            metadata=self.serde.loads_typed((row["metadata_type"], row["metadata"])),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[
+                (w["task_id"], w["channel"], self.serde.loads_typed((w["value_type"], w["value"])))
+                for w in sorted(writes, key=lambda w: writes_sort_key(w["task_path"], w["task_id"], w["idx"]))
+            ],
+        )
+
+    async def _fetch(self, connection, thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str], before: Optional[str], limit: Optional[int]):
+        conditions, params = ["thread_id = :thread_id", "checkpoint_ns = :checkpoint_ns"], {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}
+        if checkpoint_id:
+            conditions.append("checkpoint_id = :checkpoint_id")
+            params["checkpoint_id"] = checkpoint_id
+        if before:
+            conditions.append("checkpoint_id < :before")
+            params["before"] = before
+        limit_clause = ""
+        if limit is not None:
+            limit_clause = "LIMIT :limit"
+            params["limit"] = limit
+        rows = (await connection.execute(
+            text(f"""
+                SELECT checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint, metadata_type, metadata
+                FROM graph_checkpoints
+                WHERE {" AND ".join(conditions)}
+                ORDER BY checkpoint_id DESC
+                {limit_clause}
+            """),
+            params,
+        )).mappings().all()
+        if not rows:
+            return []
+        writes = (await connection.execute(
+            text("""
+                SELECT checkpoint_id, task_id, idx, channel, value_type, value, task_path
+                FROM graph_checkpoint_writes
+                WHERE thread_id = :thread_id AND checkpoint_ns = :checkpoint_ns AND checkpoint_id = ANY(:checkpoint_ids)
+            """),
+            {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_ids": [row["checkpoint_id"] for row in rows]},
+        )).mappings().all()
+        return [
+            self._tuple(thread_id, checkpoint_ns, row, [w for w in writes if w["checkpoint_id"] == row["checkpoint_id"]])
+            for row in rows
+        ]
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id, checkpoint_ns = self._thread(config)
+        async with self.engine.connect() as connection:
+            found = await self._fetch(connection, thread_id, checkpoint_ns, get_checkpoint_id(config), None, 1)
+        return found[0] if found else None
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if config is None:
+            raise ValueError("PostgresCheckpointSaver.alist needs a thread_id; listing across threads is not supported.")
+        thread_id, checkpoint_ns = self._thread(config)
+        async with self.engine.connect() as connection:
+            # Metadata is stored serialized, so a metadata filter is applied after the limit-free fetch.
+            found = await self._fetch(
+                connection, thread_id, checkpoint_ns, get_checkpoint_id(config),
+                get_checkpoint_id(before) if before else None, None if filter else limit,
+            )
+        if filter:
+            found = [t for t in found if all(t.metadata.get(k) == v for k, v in filter.items())][:limit]
+        for checkpoint_tuple in found:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id, checkpoint_ns = self._thread(config)
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        async with self.engine.begin() as connection:
+            await connection.execute(PUT_CHECKPOINT, {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"],
+                "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+                "checkpoint_type": checkpoint_type, "checkpoint": checkpoint_blob,
+                "metadata_type": metadata_type, "metadata": metadata_blob,
+            })
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        if not writes:
+            return
+        thread_id, checkpoint_ns = self._thread(config)
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, value_blob = self.serde.dumps_typed(value)
+            rows.append({
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": config["configurable"]["checkpoint_id"],
+                "task_id": task_id, "idx": WRITES_IDX_MAP.get(channel, idx), "channel": channel,
+                "value_type": value_type, "value": value_blob, "task_path": task_path,
+            })
+        async with self.engine.begin() as connection:
+            await connection.execute(PUT_WRITE, rows)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Forgets a conversation entirely (e.g. the user cleared it)."""
+        async with self.engine.begin() as connection:
+            await connection.execute(text("DELETE FROM graph_checkpoint_writes WHERE thread_id = :thread_id"), {"thread_id": thread_id})
+            await connection.execute(text("DELETE FROM graph_checkpoints WHERE thread_id = :thread_id"), {"thread_id": thread_id})
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        # aput already keeps only the latest checkpoint, so "keep_latest" has nothing left to do.
+        if strategy == "delete":
+            for thread_id in thread_ids:
+                await self.adelete_thread(thread_id)
+        elif strategy != "keep_latest":
+            raise ValueError(f"Unknown prune strategy '{strategy}'.")
@@ -1,58 +1,48 @@
 import asyncio
-from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy import text
-from core.config import DATABASE_URL
-from core.logger import logger
+from sqlalchemy.ext.asyncio import create_async_engine
+from core.config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_WARM
+from core.logger import get_logger
+from core.metrics import metrics
+from db.migrations import apply_migrations
+
+logger = get_logger("db")
 
 # Create an asynchronous engine
-engine = create_async_engine(DATABASE_URL)
+engine = create_async_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+)
+metrics.instrument_engine(engine)
 
 async def setup_database():
-    """Connects to the database and ensures all tables are created asynchronously."""
+    """Connects to the database and applies any pending schema migrations (see db/migrations.py)."""
     try:
-        async with engine.begin() as conn:
-            logger.info("Database connection successful. Ensuring schema exists...")
-
-            await conn.run_sync(lambda sync_conn: sync_conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id SERIAL PRIMARY KEY,
-                    username VARCHAR(50) UNIQUE NOT NULL,
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    profile JSONB
-                );
-            """)))
-
-            await conn.run_sync(lambda sync_conn: sync_conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS indian_food_items (
-                    food_id SERIAL PRIMARY KEY,
-                    name VARCHAR(100) NOT NULL UNIQUE,
-                    search_aliases TEXT[],
-                    serving_unit VARCHAR(20) NOT NULL,
-                    serving_weight_grams REAL NOT NULL,
-                    calories REAL,
-                    protein_grams REAL,
-                    carbs_grams REAL,
-                    fat_grams REAL
-                );
-            """)))
-
-            await conn.run_sync(lambda sync_conn: sync_conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS daily_logs (
-                    log_id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
-                    log_type VARCHAR(20) NOT NULL,
-                    log_time TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    details JSONB
-                );
-            """)))
-
-        logger.info("Schema verified/created successfully.")
+        logger.info("Connecting to the database. Checking schema version...")
+        await apply_migrations(engine)
     except Exception as e:
-        logger.exception(f"An error occurred during database setup: {e}")
+        logger.exception("An error occurred during database setup: %s", e)
         raise
+
+
+async def warm_pool(connections: int = DB_POOL_WARM):
+    """Opens `connections` pooled connections up front, so early requests don't each pay for a connect."""
+    async def touch():
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    # Held concurrently, so each one is a distinct connection left idle in the pool afterwards.
+    await asyncio.gather(*(touch() for _ in range(connections)))
+
+
+async def _run_standalone():
+    try:
+        await setup_database()
     finally:
         await engine.dispose()
 
 
 if __name__ == '__main__':
-    asyncio.run(setup_database())
\ No newline at end of file
+    asyncio.run(_run_standalone())
@@ -0,0 +1,222 @@
+"""
+Streaming export of daily_logs for one user, several users, or everyone.
+
+    python -m db.export exports/ --format parquet --since 2026-01-01
+    python -m db.export alice.csv --user 1 --since 2026-06-01 --until 2026-07-01
+
+Rows come through a server-side cursor in fixed-size chunks and are written out chunk by chunk,
+so memory stays flat however many months are exported. Each user is read with a range scan on
+ix_daily_logs_user_id_log_time; `details` is fetched as text and passed through undecoded.
+Exporting to a directory writes one file per user, several users at a time.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+from sqlalchemy import text
+from db.database import engine, setup_database
+from core.logger import get_logger
+
+logger = get_logger("db")
+
+# --- Configuration ---
+EXPORT_CHUNK_ROWS = 5_000
+# Users exported at once when writing a directory; each holds one pooled connection for its cursor.
+EXPORT_PARALLELISM = 4
+
+EXPORT_COLUMNS = (
+    "log_id", "user_id", "log_type", "log_time", "food_id", "item_name", "quantity", "unit",
+    "calories", "protein", "carbs", "fat", "details",
+)
+FORMATS = ("csv", "ndjson", "parquet")
+FILE_SUFFIXES = {"csv": ".csv", "ndjson": ".ndjson", "parquet": ".parquet"}
+
+
+def parse_timestamp(value: str) -> datetime:
+    """An ISO date or date-time; without an offset it is taken as local time, like the REPL user's day."""
+    timestamp = datetime.fromisoformat(value)
+    return timestamp if timestamp.tzinfo else timestamp.astimezone()
+
+
+def _export_query(since: Optional[datetime], until: Optional[datetime]):
+    conditions = ["user_id = :user_id"]
+    if since is not None:
+        conditions.append("log_time >= :since")
+    if until is not None:
+        conditions.append("log_time < :until")
+    return text(f"""
+        SELECT log_id, user_id, log_type, log_time, food_id, item_name, quantity, unit,
+               calories, protein, carbs, fat, CAST(details AS TEXT) AS details
+        FROM daily_logs
+        WHERE {" AND ".join(conditions)}
+        ORDER BY log_time, log_id
+    """)
+
+
+async def stream_logs(user_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Yields one user's daily_logs rows (tuples in EXPORT_COLUMNS order) in chunks of up to `chunk_rows`."""
+    async with engine.connect() as connection:
+        result = await connection.stream(
+            _export_query(since, until).execution_options(yield_per=chunk_rows),
+            {"user_id": user_id, "since": since, "until": until},
+        )
+        async for rows in result.partitions(chunk_rows):
+            yield [tuple(row) for row in rows]
+
+
+# --- Formats ---
+
+def _text_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def csv_chunk(rows, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows([[_text_value(value) for value in row] for row in rows])
+    return buffer.getvalue().encode()
+
+
+def ndjson_chunk(rows, header: bool = False) -> bytes:
+    lines = []
+    for row in rows:
+        # details is already JSON text from Postgres, so it is spliced in rather than decoded and re-encoded.
+        line = json.dumps({column: _text_value(value) for column, value in zip(EXPORT_COLUMNS[:-1], row[:-1])})
+        lines.append(f'{line[:-1]}, "details": {row[-1] or "null"}}}\n')
+    return "".join(lines).encode()
+
+
+ENCODERS = {"csv": csv_chunk, "ndjson": ndjson_chunk}
+
+
+class _ParquetFile:
+    """One row group per chunk. pyarrow is optional and only needed for this format."""
+
+    def __init__(self, path: Path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export needs pyarrow; pip install pyarrow, or use csv/ndjson.")
+        self.pa = pa
+        self.schema = pa.schema([
+            ("log_id", pa.int64()), ("user_id", pa.int64()), ("log_type", pa.string()),
+            ("log_time", pa.timestamp("us", tz="UTC")), ("food_id", pa.int64()), ("item_name", pa.string()),
+            ("quantity", pa.float32()), ("unit", pa.string()), ("calories", pa.float32()), ("protein", pa.float32()),
+            ("carbs", pa.float32()), ("fat", pa.float32()), ("details", pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)], schema=self.schema,
+        ))
+
+    def close(self):
+        self.writer.close()
+
+
+class _TextFile:
+    def __init__(self, path: Path, file_format: str):
+        self.file = path.open("wb")
+        self.encode = ENCODERS[file_format]
+        self.header = file_format == "csv"
+
+    def write(self, rows):
+        self.file.write(self.encode(rows, header=self.header))
+        self.header = False
+
+    def close(self):
+        if self.header:
+            # Nothing was exported; still leave a CSV with its header row.
+            self.file.write(self.encode([], header=True))
+        self.file.close()
+
+
+def open_export_file(path: Path, file_format: str):
+    return _ParquetFile(path) if file_format == "parquet" else _TextFile(path, file_format)
+
+
+# --- Export ---
+
+async def export_users_to_file(writer, user_ids: List[int], since=None, until=None, chunk_rows: int = EXPORT_CHUNK_ROWS) -> int:
+    """Streams each user's rows into an open export file in turn. Returns the number of rows written."""
+    exported = 0
+    for user_id in user_ids:
+        async for rows in stream_logs(user_id, since, until, chunk_rows):
+            writer.write(rows)
+            exported += len(rows)
+    return exported
+
+
+async def export_logs(destination: Path, file_format: str, user_ids: Optional[List[int]] = None, since=None, until=None,
+                      chunk_rows: int = EXPORT_CHUNK_ROWS, parallelism: int = EXPORT_PARALLELISM) -> dict:
+    """
+    Exports daily_logs to `destination`, every user unless `user_ids` is given. An existing
+    directory (or a path without a file suffix) gets one file per user, up to `parallelism` users
+    at a time; anything else is a single file with the users one after another.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown export format '{file_format}'. Use one of: {', '.join(FORMATS)}.")
+    started = time.perf_counter()
+    if user_ids is None:
+        async with engine.connect() as connection:
+            user_ids = list((await connection.execute(text("SELECT user_id FROM users ORDER BY user_id"))).scalars())
+
+    if destination.is_dir() or not destination.suffix:
+        destination.mkdir(parents=True, exist_ok=True)
+        limiter = asyncio.Semaphore(parallelism)
+
+        async def export_one(user_id: int) -> int:
+            async with limiter:
+                writer = open_export_file(destination / f"user_{user_id}{FILE_SUFFIXES[file_format]}", file_format)
+                try:
+                    return await export_users_to_file(writer, [user_id], since, until, chunk_rows)
+                finally:
+                    writer.close()
+
+        exported = sum(await asyncio.gather(*(export_one(user_id) for user_id in user_ids)))
+    else:
+        writer = open_export_file(destination, file_format)
+        try:
+            exported = await export_users_to_file(writer, user_ids, since, until, chunk_rows)
+        finally:
+            writer.close()
+
+    summary = {"users": len(user_ids), "rows": exported, "seconds": round(time.perf_counter() - started, 2)}
+    logger.info("Log export to %s finished: %s", destination, summary)
+    return summary
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Stream daily_logs out to CSV, NDJSON or Parquet.")
+    parser.add_argument("destination", type=Path, help="A file, or a directory for one file per user.")
+    parser.add_argument("--format", choices=FORMATS, help="Defaults to the destination's extension, else csv.")
+    parser.add_argument("--user", type=int, action="append", dest="user_ids", help="Repeat for several users; default all.")
+    parser.add_argument("--since", type=parse_timestamp, help="Inclusive ISO date/time, e.g. 2026-06-01.")
+    parser.add_argument("--until", type=parse_timestamp, help="Exclusive ISO date/time.")
+    parser.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS)
+    parser.add_argument("--parallel", type=int, default=EXPORT_PARALLELISM, help="Users exported at once into a directory.")
+    args = parser.parse_args()
+    file_format = args.format or {suffix: name for name, suffix in FILE_SUFFIXES.items()}.get(args.destination.suffix.lower(), "csv")
+
+    try:
+        await setup_database()
+        summary = await export_logs(args.destination, file_format, args.user_ids, args.since, args.until,
+                                    args.chunk_rows, args.parallel)
+        print(json.dumps(summary))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
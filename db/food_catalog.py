@@ -0,0 +1,300 @@
+import asyncio
+import re
+import unicodedata
+from sqlalchemy import text
+from db.database import engine
+from core.logger import get_logger
+
+logger = get_logger("db")
+
+# --- Configuration ---
+# Postgres channel the catalog trigger publishes on (see migration 2 in db/migrations.py).
+CATALOG_CHANNEL = "food_catalog_changed"
+# A best candidate at or above this score is treated as the same food.
+MATCH_THRESHOLD = 0.6
+# Candidates below this score are not worth showing to the model at all.
+SUGGESTION_THRESHOLD = 0.3
+# Bursts of NOTIFYs (e.g. a bulk import) are coalesced into a single reload.
+RELOAD_DEBOUNCE_SECONDS = 0.5
+# A trigram or word found in more search keys than this is too common to find candidates by in a large
+# catalog; it is skipped once a rarer one has supplied candidates. Smaller catalogs are searched exhaustively.
+COMMON_ENTRY_KEYS = 2000
+
+CATALOG_COLUMNS = (
+    "food_id, name, search_aliases, serving_unit, serving_weight_grams, "
+    "calories, protein_grams, carbs_grams, fat_grams"
+)
+
+
+def normalize_food_name(name: str) -> str:
+    """Lowercases, strips accents and punctuation, and collapses whitespace."""
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    name = re.sub(r"[^a-z0-9]+", " ", name.lower())
+    return " ".join(name.split())
+
+
+def _singular(token: str) -> str:
+    # "rotis" -> "roti", "samosas" -> "samosa". Applied to both sides, so it only has to be consistent.
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def name_tokens(normalized: str) -> frozenset:
+    """The set of (singularized) words in an already normalized name."""
+    return frozenset(_singular(t) for t in normalized.split())
+
+
+def _trigrams(tokens) -> frozenset:
+    """pg_trgm-style trigrams: each word is padded with two leading spaces and one trailing space."""
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class FoodCatalogIndex:
+    """
+    Process-local, read-mostly index over indian_food_items.
+    Exact lookups go through a dict of normalized names/aliases; everything else is
+    ranked by a blend of trigram similarity and token overlap via inverted trigram and word indexes.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.version = 0
+        self._foods = {}          # food_id -> row dict
+        self._exact = {}          # normalized name/alias -> food_id
+        self._keys = []           # (food_id, tokens, trigrams)
+        self._postings = {}       # trigram -> [key index]
+        self._key_ids = {}        # food_id -> [key index], so a re-added row can drop its old keys
+        self._token_keys = {}     # token -> [key index]
+        self._reload_task = None
+        self._reload_pending = False
+        self._listener_task = None
+        self._listener_stop = None
+        self._change_listeners = []
+
+    # --- Building ---
+
+    def _reset(self):
+        self._foods, self._exact, self._keys, self._postings, self._key_ids, self._token_keys = {}, {}, [], {}, {}, {}
+
+    def _add_key(self, food_id: int, key: str):
+        normalized = normalize_food_name(key)
+        if not normalized:
+            return
+        # Names win over aliases, and the first writer of an alias keeps it.
+        self._exact.setdefault(normalized, food_id)
+        tokens = name_tokens(normalized)
+        grams = _trigrams(tokens)
+        key_index = len(self._keys)
+        self._keys.append((food_id, tokens, grams))
+        self._key_ids.setdefault(food_id, []).append(key_index)
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(key_index)
+        for token in tokens:
+            self._token_keys.setdefault(token, []).append(key_index)
+
+    def _remove(self, food_id: int):
+        """Drops a row's name, aliases and search keys, handing any exact key it held to another row that has it."""
+        previous = self._foods.pop(food_id)
+        for key_index in self._key_ids.pop(food_id, []):
+            _, tokens, grams = self._keys[key_index]
+            # The slot stays (indexes are positions) but nothing points at it any more.
+            self._keys[key_index] = (food_id, frozenset(), frozenset())
+            for postings, entries in ((self._postings, grams), (self._token_keys, tokens)):
+                for entry in entries:
+                    postings[entry].remove(key_index)
+                    if not postings[entry]:
+                        del postings[entry]
+
+        for key in map(normalize_food_name, [previous["name"], *(previous.get("search_aliases") or [])]):
+            if self._exact.get(key) != food_id:
+                continue
+            del self._exact[key]
+            owners = [(normalize_food_name(row["name"]) != key, other_id) for other_id, row in self._foods.items()
+                      if key in map(normalize_food_name, [row["name"], *(row.get("search_aliases") or [])])]
+            if owners:
+                # As when building: a name wins over an alias, otherwise the first row that has it.
+                self._exact[key] = min(owners, key=lambda owner: owner[0])[1]
+
+    def add(self, row: dict):
+        """Adds (or replaces) a single food row without rebuilding the index."""
+        food_id = row["food_id"]
+        if food_id in self._foods:
+            self._remove(food_id)
+        self._foods[food_id] = row
+        self._exact[normalize_food_name(row["name"])] = food_id
+        self._add_key(food_id, row["name"])
+        for alias in row.get("search_aliases") or []:
+            self._add_key(food_id, alias)
+        self.version += 1
+        self._notify_changed([row])
+
+    def _build(self, rows):
+        self._reset()
+        for row in rows:
+            self.add(row)
+
+    @staticmethod
+    def _rebuilt(rows, previous):
+        """A fresh index over `rows`, and the rows that differ from `previous` (food_id -> row, or None)."""
+        fresh = FoodCatalogIndex()
+        fresh._build(rows)
+        changed = []
+        if previous is not None:
+            changed = [row for food_id, row in fresh._foods.items() if previous.get(food_id) != row]
+            changed += [row for food_id, row in previous.items() if food_id not in fresh._foods]
+        return fresh, changed
+
+    async def load(self):
+        """(Re)loads the full catalog from the database and swaps it in."""
+        async with engine.connect() as connection:
+            result = await connection.execute(text(f"SELECT {CATALOG_COLUMNS} FROM indian_food_items"))
+            rows = [dict(record._mapping) for record in result]
+
+        # Building takes seconds for a large catalog, so it runs off the event loop; the loop keeps
+        # serving lookups from the current index meanwhile. `previous` is a copy since add() may run.
+        previous = dict(self._foods) if self.loaded else None
+        fresh, changed = await asyncio.to_thread(self._rebuilt, rows, previous)
+        retired = [self._foods, self._exact, self._keys, self._postings, self._key_ids, self._token_keys]
+        # Swap the built structures in one go so concurrent lookups never see a half-built index.
+        self._foods, self._exact, self._keys, self._postings, self._key_ids, self._token_keys = (
+            fresh._foods, fresh._exact, fresh._keys, fresh._postings, fresh._key_ids, fresh._token_keys)
+        self.version += 1
+        self.loaded = True
+        logger.info("Food catalog index loaded with %s items.", len(rows))
+        # Freeing the old index costs about as much as building it did; that happens off the loop too.
+        del fresh, previous
+        await asyncio.to_thread(retired.clear)
+
+        if changed:
+            self._notify_changed(changed)
+
+    # --- Change notification ---
+
+    def add_change_listener(self, callback):
+        """Registers `callback(rows)`, called with every row added, updated or removed after the initial load."""
+        self._change_listeners.append(callback)
+
+    def _notify_changed(self, rows: list):
+        for callback in self._change_listeners:
+            try:
+                callback(rows)
+            except Exception as e:
+                logger.error("Food catalog change listener failed: %s", e, exc_info=True)
+
+    # --- Lookup ---
+
+    def search(self, food_name: str, limit: int = 5, min_score: float = SUGGESTION_THRESHOLD) -> list:
+        """Returns up to `limit` (score, row) pairs scoring `min_score` or more, best first. An exact name/alias hit scores 1.0."""
+        normalized = normalize_food_name(food_name)
+        if not normalized:
+            return []
+
+        exact_id = self._exact.get(normalized)
+        if exact_id is not None:
+            return [(1.0, self._foods[exact_id])]
+
+        query_tokens = name_tokens(normalized)
+        query_grams = _trigrams(query_tokens)
+        # Both scores are at most the share of the query's trigrams (or words) a key has, so a key scoring
+        # min_score has one of any (1 - min_score) share of them: the rarest are enough to find every
+        # candidate, and the most common ones ("  c", "ala", "masala") are not scanned.
+        candidates = set()
+        for index, entries in ((self._postings, query_grams), (self._token_keys, query_tokens)):
+            postings = sorted((index.get(entry, ()) for entry in entries), key=len)
+            for keys in postings[:len(postings) - int(min_score * len(postings)) + 1]:
+                if candidates and len(keys) > COMMON_ENTRY_KEYS:
+                    break
+                candidates.update(keys)
+
+        best = {}
+        for key_index in candidates:
+            food_id, tokens, grams = self._keys[key_index]
+            overlap = len(query_grams & grams)
+            trigram_score = overlap / (len(query_grams) + len(grams) - overlap)
+            common = len(query_tokens & tokens)
+            # Rewards candidates whose words are all present in the query ("paneer tikka" for "paneer tikka masala").
+            token_score = (common / len(tokens)) * (common / len(query_tokens))
+            score = max(trigram_score, token_score)
+            if score > best.get(food_id, 0.0):
+                best[food_id] = score
+
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(round(score, 3), self._foods[food_id]) for food_id, score in ranked if score >= min_score]
+
+    def get_exact(self, food_name: str):
+        """Returns the row whose normalized name or alias equals `food_name`'s, or None."""
+        food_id = self._exact.get(normalize_food_name(food_name))
+        return self._foods.get(food_id) if food_id is not None else None
+
+    def best_match(self, food_name: str):
+        """Returns (score, row) for a confident match, or None."""
+        candidates = self.search(food_name, limit=1, min_score=MATCH_THRESHOLD)
+        return candidates[0] if candidates else None
+
+    # --- Cross-process freshness ---
+
+    def _on_notify(self, connection, pid, channel, payload):
+        logger.info("Food catalog change notification received (%s); scheduling reload.", payload)
+        self._reload_pending = True
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.get_running_loop().create_task(self._debounced_reload())
+
+    async def _debounced_reload(self):
+        # A change notified while a reload is running may have missed its SELECT, so go round again.
+        while self._reload_pending:
+            await asyncio.sleep(RELOAD_DEBOUNCE_SECONDS)
+            self._reload_pending = False
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error("Failed to reload food catalog index: %s", e, exc_info=True)
+
+    async def _listen(self):
+        reconnecting = False
+        while not self._listener_stop.is_set():
+            try:
+                async with engine.connect() as connection:
+                    raw = (await connection.get_raw_connection()).driver_connection
+                    lost = asyncio.Event()
+                    raw.add_termination_listener(lambda _conn: lost.set())
+                    await raw.add_listener(CATALOG_CHANNEL, self._on_notify)
+                    # Anything that changed while we were not listening is picked up here.
+                    if reconnecting:
+                        await self.load()
+                    stop_waiter = asyncio.create_task(self._listener_stop.wait())
+                    lost_waiter = asyncio.create_task(lost.wait())
+                    await asyncio.wait({stop_waiter, lost_waiter}, return_when=asyncio.FIRST_COMPLETED)
+                    stop_waiter.cancel()
+                    lost_waiter.cancel()
+                    if lost.is_set():
+                        raise ConnectionError("listener connection was closed")
+                    await raw.remove_listener(CATALOG_CHANNEL, self._on_notify)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Food catalog listener failed, retrying: %s", e, exc_info=True)
+                reconnecting = True
+                await asyncio.sleep(5)
+
+    def start_listener(self):
+        """Keeps the index in sync with changes made by other processes via LISTEN/NOTIFY."""
+        if self._listener_task is None:
+            self._listener_stop = asyncio.Event()
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop_listener(self):
+        if self._listener_task is not None:
+            self._listener_stop.set()
+            try:
+                await asyncio.wait_for(self._listener_task, timeout=5)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._listener_task.cancel()
+            self._listener_task = None
+
+
+food_catalog = FoodCatalogIndex()
@@ -0,0 +1,239 @@
+"""
+Bulk loader for nutrition datasets (IFCT-style CSV or JSON Lines) into indian_food_items.
+
+    python -m db.importer data/ifct.csv
+    python -m db.importer foods.jsonl --keep-existing
+
+Rows are streamed in batches with COPY into a temporary staging table, then merged with one
+set-based upsert on `name`; aliases are unioned with the ones already in search_aliases.
+The whole import is a single transaction, so a failure leaves the catalog untouched.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import re
+import time
+from pathlib import Path
+from db.database import engine, setup_database
+from core.logger import get_logger
+
+logger = get_logger("db")
+
+# --- Configuration ---
+COPY_BATCH_ROWS = 20_000
+# Column widths from indian_food_items (db/migrations.py).
+NAME_MAX_LENGTH = 100
+SERVING_UNIT_MAX_LENGTH = 20
+KJ_PER_KCAL = 4.184
+
+# Accepted source headers for each catalog column (compared after lowercasing and normalizing separators).
+FIELD_ALIASES = {
+    "name": ("name", "food_name", "food", "item", "description"),
+    "search_aliases": ("search_aliases", "aliases", "alias", "other_names", "local_names"),
+    "serving_unit": ("serving_unit", "unit", "serving"),
+    "serving_weight_grams": ("serving_weight_grams", "serving_weight", "serving_grams", "grams", "weight_g"),
+    "calories": ("calories", "energy_kcal", "enerc_kcal", "kcal", "energy"),
+    "energy_kj": ("energy_kj", "enerc_kj", "enerc", "kj"),
+    "protein_grams": ("protein_grams", "protein", "protcnt", "protein_g"),
+    "carbs_grams": ("carbs_grams", "carbs", "carbohydrate", "carbohydrates", "choavldf", "carbs_g"),
+    "fat_grams": ("fat_grams", "fat", "total_fat", "fatce", "fat_g"),
+}
+# IFCT publishes values per 100 g, so that is the serving when the dataset doesn't name one.
+DEFAULT_SERVING_UNIT = "100g"
+DEFAULT_SERVING_WEIGHT_GRAMS = 100.0
+
+STAGING_COLUMNS = (
+    "seq", "name", "search_aliases", "serving_unit", "serving_weight_grams",
+    "calories", "protein_grams", "carbs_grams", "fat_grams",
+)
+
+# Later rows for the same name win; every row's aliases are kept. Names are deduplicated first
+# because ON CONFLICT may not touch the same target row twice in one statement.
+MERGE_STAGING = """
+    WITH latest AS (
+        SELECT DISTINCT ON (name) * FROM food_import_staging ORDER BY name, seq DESC
+    ), merged_aliases AS (
+        SELECT s.name, array_agg(DISTINCT a.alias) FILTER (WHERE a.alias IS NOT NULL) AS aliases
+        FROM food_import_staging s
+        LEFT JOIN LATERAL unnest(s.search_aliases) AS a(alias) ON TRUE
+        GROUP BY s.name
+    ), upserted AS (
+        INSERT INTO indian_food_items AS f
+            (name, search_aliases, serving_unit, serving_weight_grams, calories, protein_grams, carbs_grams, fat_grams)
+        SELECT l.name, m.aliases, l.serving_unit, l.serving_weight_grams,
+               l.calories, l.protein_grams, l.carbs_grams, l.fat_grams
+        FROM latest l JOIN merged_aliases m USING (name)
+        ON CONFLICT (name) DO UPDATE SET
+            search_aliases = (
+                SELECT array_agg(DISTINCT alias) FROM unnest(f.search_aliases || EXCLUDED.search_aliases) AS alias
+            ),
+            {updates}
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT COUNT(*) FILTER (WHERE inserted) AS inserted, COUNT(*) FILTER (WHERE NOT inserted) AS updated FROM upserted
+"""
+NUTRITION_COLUMNS = ("serving_unit", "serving_weight_grams", "calories", "protein_grams", "carbs_grams", "fat_grams")
+
+
+def _merge_sql(keep_existing: bool) -> str:
+    # Either side's value is used when the other is missing; which side wins otherwise depends on keep_existing.
+    first, second = ("f", "EXCLUDED") if keep_existing else ("EXCLUDED", "f")
+    updates = ",\n            ".join(f"{c} = COALESCE({first}.{c}, {second}.{c})" for c in NUTRITION_COLUMNS)
+    return MERGE_STAGING.format(updates=updates)
+
+
+def _header_map(headers) -> dict:
+    """Source header -> catalog column, for the headers we recognise."""
+    lookup = {alias: column for column, aliases in FIELD_ALIASES.items() for alias in aliases}
+    mapping = {}
+    for header in headers:
+        key = re.sub(r"[^a-z0-9]+", "_", str(header).strip().lower()).strip("_")
+        if key in lookup and lookup[key] not in mapping.values():
+            mapping[header] = lookup[key]
+    return mapping
+
+
+def _number(value):
+    if value is None or value == "":
+        return None
+    try:
+        return float(str(value).replace(",", "").strip())
+    except ValueError:
+        return None
+
+
+def _aliases(value) -> list:
+    if isinstance(value, str):
+        value = re.split(r"[|;,]", value)
+    return sorted({" ".join(str(alias).lower().split()) for alias in value or [] if str(alias).strip()})
+
+
+def to_record(seq: int, raw: dict, mapping: dict):
+    """One source row -> a staging record tuple, or None when it has no usable name or energy value."""
+    row = {column: raw.get(header) for header, column in mapping.items()}
+    name = " ".join(str(row.get("name") or "").split())[:NAME_MAX_LENGTH]
+    calories = _number(row.get("calories"))
+    if calories is None and _number(row.get("energy_kj")) is not None:
+        calories = round(_number(row["energy_kj"]) / KJ_PER_KCAL, 1)
+    if not name or calories is None:
+        return None
+    aliases = [alias for alias in _aliases(row.get("search_aliases")) if alias != name.lower()]
+    return (
+        seq,
+        name,
+        aliases,
+        (str(row.get("serving_unit") or "").strip() or DEFAULT_SERVING_UNIT)[:SERVING_UNIT_MAX_LENGTH],
+        _number(row.get("serving_weight_grams")) or DEFAULT_SERVING_WEIGHT_GRAMS,
+        calories,
+        _number(row.get("protein_grams")),
+        _number(row.get("carbs_grams")),
+        _number(row.get("fat_grams")),
+    )
+
+
+def read_rows(path: Path, file_format: str):
+    """Yields source rows as dicts. CSV and JSON Lines are streamed; a JSON array is read whole."""
+    if file_format == "csv":
+        with path.open(newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+    elif file_format == "jsonl":
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with path.open(encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def read_batches(path: Path, file_format: str, batch_size: int = COPY_BATCH_ROWS):
+    """
+    Yields (records, skipped so far) with at most `batch_size` staging records each.
+    The last item always comes through, possibly empty, so its skipped count is the total.
+    """
+    mapping, batch, skipped = None, [], 0
+    for seq, raw in enumerate(read_rows(path, file_format)):
+        if mapping is None:
+            mapping = _header_map(raw.keys())
+            if "name" not in mapping.values() or not {"calories", "energy_kj"} & set(mapping.values()):
+                raise ValueError(f"{path} needs a name column and a calories (kcal) or energy (kJ) column; found {list(raw.keys())}")
+        record = to_record(seq, raw, mapping)
+        if record is None:
+            skipped += 1
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch, skipped
+            batch = []
+    yield batch, skipped
+
+
+def _detect_format(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return "json" if suffix == ".json" else "csv"
+
+
+async def import_foods(path: Path, file_format: str = None, keep_existing: bool = False, batch_size: int = COPY_BATCH_ROWS) -> dict:
+    """
+    Loads a dataset into indian_food_items and returns {"staged", "skipped", "inserted", "updated"}.
+    With keep_existing, rows already in the catalog only gain aliases; their nutrition is left alone.
+    """
+    file_format = file_format or _detect_format(path)
+    started = time.perf_counter()
+    staged = skipped = 0
+
+    async with engine.connect() as connection:
+        raw = (await connection.get_raw_connection()).driver_connection
+        async with raw.transaction():
+            await raw.execute("""
+                CREATE TEMP TABLE food_import_staging (
+                    seq BIGINT NOT NULL,
+                    name VARCHAR(100) NOT NULL,
+                    search_aliases TEXT[] NOT NULL,
+                    serving_unit VARCHAR(20) NOT NULL,
+                    serving_weight_grams REAL NOT NULL,
+                    calories REAL, protein_grams REAL, carbs_grams REAL, fat_grams REAL
+                ) ON COMMIT DROP
+            """)
+            for batch, skipped in read_batches(path, file_format, batch_size):
+                if batch:
+                    await raw.copy_records_to_table("food_import_staging", records=batch, columns=STAGING_COLUMNS)
+                    staged += len(batch)
+                    logger.info("Food import: staged %s rows from %s.", staged, path.name)
+
+            await raw.execute("ANALYZE food_import_staging")
+            counts = await raw.fetchrow(_merge_sql(keep_existing))
+
+    summary = {
+        "staged": staged,
+        "skipped": skipped,
+        "inserted": counts["inserted"],
+        "updated": counts["updated"],
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    logger.info("Food import from %s finished: %s", path.name, summary)
+    return summary
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Bulk-load a nutrition dataset into indian_food_items.")
+    parser.add_argument("path", type=Path, help="CSV, JSON Lines (.jsonl/.ndjson) or JSON array file.")
+    parser.add_argument("--format", choices=["csv", "jsonl", "json"], help="Defaults to the file extension.")
+    parser.add_argument("--keep-existing", action="store_true",
+                        help="Only merge aliases into foods already in the catalog; don't overwrite their nutrition.")
+    parser.add_argument("--batch-size", type=int, default=COPY_BATCH_ROWS)
+    args = parser.parse_args()
+
+    try:
+        await setup_database()
+        summary = await import_foods(args.path, args.format, args.keep_existing, args.batch_size)
+        print(json.dumps(summary))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
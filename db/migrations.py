@@ -0,0 +1,222 @@
+from typing import List, NamedTuple
+from sqlalchemy import text
+from core.logger import get_logger
+
+logger = get_logger("db")
+
+# Arbitrary but fixed key for pg_advisory_xact_lock, so concurrently starting workers migrate one at a time.
+MIGRATION_LOCK_KEY = 7_316_001
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: List[str]
+
+
+# --- Migrations ---
+# Append only. Every statement must be idempotent, because databases created before
+# schema_version existed already have some of these objects.
+MIGRATIONS = [
+    Migration(1, "Base tables", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id SERIAL PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            profile JSONB
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS indian_food_items (
+            food_id SERIAL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL UNIQUE,
+            search_aliases TEXT[],
+            serving_unit VARCHAR(20) NOT NULL,
+            serving_weight_grams REAL NOT NULL,
+            calories REAL,
+            protein_grams REAL,
+            carbs_grams REAL,
+            fat_grams REAL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS daily_logs (
+            log_id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
+            log_type VARCHAR(20) NOT NULL,
+            log_time TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            details JSONB
+        )
+        """,
+    ]),
+    # Lets every process's in-memory food catalog index (db/food_catalog.py) know when the table changed.
+    # Statement-level, so a bulk load produces one notification rather than one per row.
+    Migration(2, "Food catalog change notifications", [
+        """
+        CREATE OR REPLACE FUNCTION notify_food_catalog_changed() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('food_catalog_changed', TG_OP);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS food_catalog_changed ON indian_food_items",
+        """
+        CREATE TRIGGER food_catalog_changed
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON indian_food_items
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_food_catalog_changed()
+        """,
+    ]),
+    Migration(3, "Indexes for food search and per-user log scans", [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        # Serves `name ILIKE :name` without a sequential scan.
+        "CREATE INDEX IF NOT EXISTS ix_indian_food_items_name_trgm ON indian_food_items USING GIN (name gin_trgm_ops)",
+        # Serves `search_aliases @> ARRAY[:name]`.
+        "CREATE INDEX IF NOT EXISTS ix_indian_food_items_search_aliases ON indian_food_items USING GIN (search_aliases)",
+        "CREATE INDEX IF NOT EXISTS ix_daily_logs_user_id_log_time ON daily_logs (user_id, log_time)",
+    ]),
+    # Shared by every worker, so a dish looked up once is never sent to Tavily again while fresh.
+    Migration(4, "Web search result cache", [
+        """
+        CREATE TABLE IF NOT EXISTS web_search_cache (
+            query_key TEXT PRIMARY KEY,
+            results JSONB NOT NULL,
+            fetched_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    # Kept current by insert_food_logs in tools/food_tools.py; rebuilt with `python -m db.rollups backfill`.
+    Migration(5, "Per-user daily nutrition rollups", [
+        """
+        CREATE TABLE IF NOT EXISTS daily_nutrition_rollups (
+            user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            calories REAL NOT NULL DEFAULT 0,
+            protein REAL NOT NULL DEFAULT 0,
+            carbs REAL NOT NULL DEFAULT 0,
+            fat REAL NOT NULL DEFAULT 0,
+            item_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day)
+        )
+        """,
+    ]),
+    # Food entries move out of the details blob into real columns. The blob is left in place for
+    # food rows too, so the backfill can be checked against it; item_name and unit were free text
+    # from the model, hence TEXT.
+    Migration(6, "Typed food columns on daily_logs", [
+        """
+        ALTER TABLE daily_logs
+            ADD COLUMN IF NOT EXISTS food_id INTEGER REFERENCES indian_food_items(food_id) ON DELETE SET NULL,
+            ADD COLUMN IF NOT EXISTS item_name TEXT,
+            ADD COLUMN IF NOT EXISTS quantity REAL,
+            ADD COLUMN IF NOT EXISTS unit TEXT,
+            ADD COLUMN IF NOT EXISTS calories REAL,
+            ADD COLUMN IF NOT EXISTS protein REAL,
+            ADD COLUMN IF NOT EXISTS carbs REAL,
+            ADD COLUMN IF NOT EXISTS fat REAL
+        """,
+        """
+        UPDATE daily_logs SET
+            item_name = details->>'item_name',
+            quantity = CAST(details->>'quantity' AS REAL),
+            unit = details->>'unit',
+            calories = CAST(details->>'calories' AS REAL),
+            protein = CAST(details->>'protein' AS REAL),
+            carbs = CAST(details->>'carbs' AS REAL),
+            fat = CAST(details->>'fat' AS REAL)
+        WHERE log_type = 'food' AND details IS NOT NULL AND item_name IS NULL
+        """,
+        """
+        UPDATE daily_logs d SET food_id = f.food_id
+        FROM indian_food_items f
+        WHERE d.food_id IS NULL AND d.item_name IS NOT NULL AND lower(f.name) = lower(d.item_name)
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_daily_logs_food_id ON daily_logs (food_id)",
+    ]),
+    # Per-user conversation state for the agent graph (db/checkpointer.py).
+    Migration(7, "Agent conversation checkpoints", [
+        """
+        CREATE TABLE IF NOT EXISTS graph_checkpoints (
+            thread_id TEXT NOT NULL,
+            checkpoint_ns TEXT NOT NULL DEFAULT '',
+            checkpoint_id TEXT NOT NULL,
+            parent_checkpoint_id TEXT,
+            checkpoint_type TEXT NOT NULL,
+            checkpoint BYTEA NOT NULL,
+            metadata_type TEXT NOT NULL,
+            metadata BYTEA NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS graph_checkpoint_writes (
+            thread_id TEXT NOT NULL,
+            checkpoint_ns TEXT NOT NULL DEFAULT '',
+            checkpoint_id TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            channel TEXT NOT NULL,
+            value_type TEXT NOT NULL,
+            value BYTEA NOT NULL,
+            task_path TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+        )
+        """,
+    ]),
+    # Bearer tokens for serving mode (db/users.py); only a SHA-256 of each token is stored.
+    Migration(8, "API tokens", [
+        """
+        CREATE TABLE IF NOT EXISTS api_tokens (
+            token_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+async def _current_version(conn) -> int:
+    exists = (await conn.execute(text("SELECT to_regclass('schema_version') IS NOT NULL"))).scalar()
+    if not exists:
+        return 0
+    return (await conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version"))).scalar()
+
+
+async def apply_migrations(engine):
+    """Brings the schema up to LATEST_VERSION. Costs two cheap queries when it is already current."""
+    async with engine.connect() as conn:
+        current = await _current_version(conn)
+    if current >= LATEST_VERSION:
+        logger.info("Database schema is current (version %s); skipping migrations.", current)
+        return
+
+    # Postgres DDL is transactional, so either every pending migration lands or none does.
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        await conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        # Another worker may have migrated while we waited for the lock.
+        current = await _current_version(conn)
+
+        for migration in MIGRATIONS:
+            if migration.version <= current:
+                continue
+            logger.info("Applying migration %s: %s", migration.version, migration.description)
+            for statement in migration.statements:
+                await conn.execute(text(statement))
+            await conn.execute(
+                text("INSERT INTO schema_version (version, description) VALUES (:version, :description)"),
+                {"version": migration.version, "description": migration.description},
+            )
+
+    logger.info("Database schema migrated from version %s to %s.", current, LATEST_VERSION)
@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+from sqlalchemy import text
+from db.database import engine, setup_database
+from core.logger import get_logger
+
+logger = get_logger("db")
+
+# --- Configuration ---
+BACKFILL_BATCH_SIZE = 50_000
+
+# Folds a set of food rows (exposed as `source`) into the per-user, per-day totals.
+# The day is log_time's date in the session time zone, the same rule used at write time.
+UPSERT_ROLLUPS_FROM = """
+    INSERT INTO daily_nutrition_rollups AS r (user_id, day, calories, protein, carbs, fat, item_count)
+    SELECT user_id, CAST(log_time AS DATE),
+           COALESCE(SUM(calories), 0), COALESCE(SUM(protein), 0),
+           COALESCE(SUM(carbs), 0), COALESCE(SUM(fat), 0),
+           COUNT(*)
+    FROM source
+    GROUP BY user_id, CAST(log_time AS DATE)
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        calories = r.calories + EXCLUDED.calories,
+        protein = r.protein + EXCLUDED.protein,
+        carbs = r.carbs + EXCLUDED.carbs,
+        fat = r.fat + EXCLUDED.fat,
+        item_count = r.item_count + EXCLUDED.item_count
+"""
+
+
+# Takes a set of deleted food rows (exposed as `source`) back out of the per-user, per-day totals.
+# An UPDATE with no RETURNING, so it can run as a data-modifying CTE next to the DELETE that feeds it.
+SUBTRACT_ROLLUPS_FROM = """
+    UPDATE daily_nutrition_rollups AS r SET
+        calories = r.calories - s.calories,
+        protein = r.protein - s.protein,
+        carbs = r.carbs - s.carbs,
+        fat = r.fat - s.fat,
+        item_count = r.item_count - s.item_count
+    FROM (
+        SELECT user_id, CAST(log_time AS DATE) AS day,
+               COALESCE(SUM(calories), 0) AS calories, COALESCE(SUM(protein), 0) AS protein,
+               COALESCE(SUM(carbs), 0) AS carbs, COALESCE(SUM(fat), 0) AS fat,
+               COUNT(*) AS item_count
+        FROM source
+        GROUP BY user_id, CAST(log_time AS DATE)
+    ) AS s
+    WHERE r.user_id = s.user_id AND r.day = s.day
+"""
+
+
+# Period name -> (days back to the first day, days back to the last day), both inclusive.
+PERIOD_OFFSETS = {"today": (0, 0), "yesterday": (1, 1), "week": (6, 0)}
+
+
+async def fetch_totals(user_id: int, period: str = "today") -> dict:
+    """
+    Sums the rollup rows for a period: a primary-key range read of at most one row per day.
+    Days are counted from the database's CURRENT_DATE, the same clock the rows were written with.
+    """
+    if period not in PERIOD_OFFSETS:
+        raise ValueError(f"Unknown period '{period}'. Use one of: {', '.join(PERIOD_OFFSETS)}.")
+    start_offset, end_offset = PERIOD_OFFSETS[period]
+    async with engine.connect() as connection:
+        result = await connection.execute(
+            text("""
+                SELECT CURRENT_DATE - CAST(:start_offset AS INTEGER) AS start_day, CURRENT_DATE - CAST(:end_offset AS INTEGER) AS end_day,
+                       COALESCE(SUM(calories), 0) AS calories, COALESCE(SUM(protein), 0) AS protein,
+                       COALESCE(SUM(carbs), 0) AS carbs, COALESCE(SUM(fat), 0) AS fat,
+                       COALESCE(SUM(item_count), 0) AS item_count
+                FROM daily_nutrition_rollups
+                WHERE user_id = :user_id AND day BETWEEN CURRENT_DATE - CAST(:start_offset AS INTEGER) AND CURRENT_DATE - CAST(:end_offset AS INTEGER)
+            """),
+            {"user_id": user_id, "start_offset": start_offset, "end_offset": end_offset},
+        )
+        row = dict(result.one()._mapping)
+    return {
+        "period": period,
+        "start_day": row["start_day"].isoformat(),
+        "end_day": row["end_day"].isoformat(),
+        "calories": round(float(row["calories"]), 1),
+        "protein": round(float(row["protein"]), 1),
+        "carbs": round(float(row["carbs"]), 1),
+        "fat": round(float(row["fat"]), 1),
+        "item_count": int(row["item_count"]),
+    }
+
+
+async def backfill_rollups(batch_size: int = BACKFILL_BATCH_SIZE):
+    """
+    Rebuilds daily_nutrition_rollups from daily_logs in log_id batches.
+    Aggregation happens in Postgres, so memory stays flat however many rows there are.
+    """
+    async with engine.begin() as connection:
+        # Writers keep inserting into daily_logs but queue on their rollup upsert until we commit,
+        # so their rows are neither counted twice nor lost.
+        await connection.execute(text("LOCK TABLE daily_nutrition_rollups IN EXCLUSIVE MODE"))
+        await connection.execute(text("DELETE FROM daily_nutrition_rollups"))
+        max_log_id = (await connection.execute(text("SELECT COALESCE(MAX(log_id), 0) FROM daily_logs"))).scalar()
+
+        stmt = text(
+            "WITH source AS (SELECT user_id, log_time, calories, protein, carbs, fat FROM daily_logs "
+            "WHERE log_type = 'food' AND log_id > :low AND log_id <= :high)" + UPSERT_ROLLUPS_FROM
+        )
+        for low in range(0, max_log_id, batch_size):
+            high = min(low + batch_size, max_log_id)
+            await connection.execute(stmt, {"low": low, "high": high})
+            logger.info("Rollup backfill: folded daily_logs rows up to log_id %s of %s.", high, max_log_id)
+
+    logger.info("Rollup backfill complete.")
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Maintain the per-user daily nutrition rollups.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    backfill = subcommands.add_parser("backfill", help="Rebuild the rollups from existing daily_logs rows.")
+    backfill.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    try:
+        await setup_database()
+        if args.command == "backfill":
+            await backfill_rollups(args.batch_size)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
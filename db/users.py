@@ -0,0 +1,85 @@
+"""
+Users and the bearer tokens that serving mode authenticates them with.
+
+    python -m db.users add alice          # creates the user and prints a token
+    python -m db.users token 3            # issues another token for user 3
+    python -m db.users revoke <token>
+
+Tokens are shown once; only their SHA-256 is stored, so a leaked database doesn't leak them.
+"""
+import argparse
+import asyncio
+import hashlib
+import secrets
+from typing import Optional
+from sqlalchemy import text
+from db.database import engine, setup_database
+from core.logger import get_logger
+
+logger = get_logger("db")
+
+# --- Configuration ---
+TOKEN_BYTES = 32
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def create_user(username: str) -> int:
+    async with engine.begin() as connection:
+        return (await connection.execute(
+            text("INSERT INTO users (username) VALUES (:username) RETURNING user_id"), {"username": username},
+        )).scalar()
+
+
+async def issue_token(user_id: int) -> str:
+    token = secrets.token_urlsafe(TOKEN_BYTES)
+    async with engine.begin() as connection:
+        await connection.execute(
+            text("INSERT INTO api_tokens (token_hash, user_id) VALUES (:token_hash, :user_id)"),
+            {"token_hash": _token_hash(token), "user_id": user_id},
+        )
+    return token
+
+
+async def revoke_token(token: str) -> bool:
+    async with engine.begin() as connection:
+        result = await connection.execute(text("DELETE FROM api_tokens WHERE token_hash = :token_hash"), {"token_hash": _token_hash(token)})
+    return bool(result.rowcount)
+
+
+async def user_for_token(token: str) -> Optional[int]:
+    """The user a bearer token belongs to, or None for an unknown or revoked token."""
+    async with engine.connect() as connection:
+        return (await connection.execute(
+            text("SELECT user_id FROM api_tokens WHERE token_hash = :token_hash"), {"token_hash": _token_hash(token)},
+        )).scalar()
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Manage users and their API tokens.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    add = subcommands.add_parser("add", help="Create a user and issue their first token.")
+    add.add_argument("username")
+    token = subcommands.add_parser("token", help="Issue another token for an existing user.")
+    token.add_argument("user_id", type=int)
+    revoke = subcommands.add_parser("revoke", help="Revoke a token.")
+    revoke.add_argument("token")
+    args = parser.parse_args()
+
+    try:
+        await setup_database()
+        if args.command == "add":
+            user_id = await create_user(args.username)
+            print(f"user_id={user_id} token={await issue_token(user_id)}")
+        elif args.command == "token":
+            print(f"user_id={args.user_id} token={await issue_token(args.user_id)}")
+        else:
+            print("revoked" if await revoke_token(args.token) else "no such token")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
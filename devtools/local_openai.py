@@ -0,0 +1,54 @@
+import json
+import time
+import uuid
+from devtools.stand_in import Faults, LocalStandIn
+
+DEFAULT_REPLY = "Logged your meal."
+
+
+class LocalOpenAIServer(LocalStandIn):
+    """
+    A stand-in for the OpenAI chat completions API that always answers with `reply` and no tool calls,
+    streamed as server-sent events when the request asks for it. Set OPENAI_BASE_URL to `server.url`
+    to drive the real ChatOpenAI client (timeouts, retries, circuit breaker) without the network.
+    """
+
+    def __init__(self, reply: str = DEFAULT_REPLY, latency_seconds: float = 0.0, faults: Faults = None):
+        super().__init__(latency_seconds, faults)
+        self.reply = reply
+
+    @property
+    def url(self) -> str:
+        return super().url + "/v1"
+
+    def respond(self, path: str, headers, body: dict):
+        if path != "/v1/chat/completions":
+            return 404, {"error": {"message": "not found"}}
+        if not headers.get("Authorization", "").startswith("Bearer "):
+            return 401, {"error": {"message": "missing api key"}}
+
+        completion_id, created, model = f"chatcmpl-{uuid.uuid4().hex[:12]}", int(time.time()), body.get("model", "stand-in")
+        usage = {"prompt_tokens": sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", [])),
+                 "completion_tokens": len(self.reply) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if not body.get("stream"):
+            return 200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.reply}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        def event(choices: list, **extra) -> str:
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model, "choices": choices, **extra}
+            return f"data: {json.dumps(chunk)}\n\n"
+
+        def delta(content: dict, finish_reason=None) -> list:
+            return [{"index": 0, "delta": content, "finish_reason": finish_reason}]
+
+        words = [word + " " for word in self.reply.split(" ")]
+        words[-1] = words[-1].rstrip()
+        stream = [event(delta({"role": "assistant", "content": ""}))]
+        stream += [event(delta({"content": word})) for word in words]
+        # The usage chunk has no choices, as the real API sends it with stream_options.include_usage.
+        stream += [event(delta({}, "stop")), event([], usage=usage), "data: [DONE]\n\n"]
+        return 200, "".join(stream).encode(), "text/event-stream"
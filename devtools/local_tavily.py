@@ -0,0 +1,31 @@
+from devtools.stand_in import Faults, LocalStandIn
+
+# --- Canned Data ---
+# Loosely modelled on real Tavily snippets seen in logs/app.log.
+DEFAULT_RESULTS = [
+    {
+        "title": "Nutrition facts",
+        "url": "https://example.invalid/nutrition",
+        "content": "1 serving = 100g. Amount Per Serving 150 Calories. Total Fat 3.5g. Total Carbohydrate 30g. Protein 2g.",
+        "score": 0.9,
+    },
+]
+
+
+class LocalTavilyServer(LocalStandIn):
+    """
+    A stand-in for the Tavily search API that runs on localhost in a background thread.
+    Point TAVILY_BASE_URL at `server.url` to exercise the real client code without the network;
+    pass `faults` (devtools/stand_in.py) to make it fail or stall some of the time.
+    """
+
+    def __init__(self, results=None, latency_seconds: float = 0.0, faults: Faults = None):
+        super().__init__(latency_seconds, faults)
+        self.results = results if results is not None else DEFAULT_RESULTS
+
+    def respond(self, path: str, headers, body: dict):
+        if path != "/search":
+            return 404, {"detail": "not found"}
+        if not headers.get("Authorization", "").startswith("Bearer "):
+            return 401, {"detail": "missing api key"}
+        return 200, {"query": body.get("query"), "results": self.results[: body.get("max_results", 5)]}
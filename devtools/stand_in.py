@@ -0,0 +1,120 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Faults:
+    """
+    What a stand-in gets wrong, and how often; the rates are probabilities per request and can be
+    changed while the server runs. "error" answers with `error_status`, "slow" adds `slow_seconds`
+    and "drop" closes the connection without answering.
+    """
+
+    def __init__(self, error_rate: float = 0.0, error_status: int = 503, slow_rate: float = 0.0,
+                 slow_seconds: float = 5.0, drop_rate: float = 0.0, seed=None):
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.drop_rate = drop_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def pick(self):
+        """The fault for the next request ("error", "slow", "drop") or None."""
+        with self._lock:
+            roll = self._random.random()
+        for fault, rate in (("drop", self.drop_rate), ("error", self.error_rate), ("slow", self.slow_rate)):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+
+class LocalStandIn:
+    """
+    Base for the local provider stand-ins: an HTTP server on localhost in a background thread
+    that records every request, adds latency and injects faults before handing off to `respond`.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0, faults: Faults = None):
+        self.latency_seconds = latency_seconds
+        self.faults = faults or Faults()
+        self.requests = []    # parsed JSON bodies, in arrival order
+        self.fault_counts = {"error": 0, "slow": 0, "drop": 0}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}"
+
+    def respond(self, path: str, headers, body: dict):
+        """Returns (status, payload dict) or (status, bytes, content type) for a request that got through."""
+        raise NotImplementedError
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                fault = server.faults.pick()
+                with server._lock:
+                    server.requests.append(body)
+                    if fault:
+                        server.fault_counts[fault] += 1
+                if server.latency_seconds:
+                    time.sleep(server.latency_seconds)
+                if fault == "slow":
+                    time.sleep(server.faults.slow_seconds)
+                if fault == "drop":
+                    self.close_connection = True
+                    self.connection.close()
+                    return
+                if fault == "error":
+                    self._reply(server.faults.error_status, json.dumps({"error": {"message": "injected fault"}}).encode(), "application/json")
+                    return
+
+                reply = server.respond(self.path, self.headers, body)
+                if len(reply) == 2:
+                    status, payload = reply
+                    reply = (status, json.dumps(payload).encode(), "application/json")
+                self._reply(*reply)
+
+            def _reply(self, status: int, data: bytes, content_type: str):
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass    # the client gave up (timeout or a hedge won)
+
+            def log_message(self, format, *args):
+                pass    # keep test output clean
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -1,25 +1,95 @@
+import argparse
 import asyncio
-from sqlalchemy import text
-from core.logger import logger
-from db.database import engine, setup_database
-from agents.food_agent import build_agent_graph
-from langchain_core.messages import HumanMessage
+import importlib
+import time
+# Only config and logging are imported up front; everything heavy loads in warm_up() behind the prompt.
+from core.config import SERVER_HOST, SERVER_PORT, METRICS_ENABLED, METRICS_DUMP_SECONDS
+from core.logger import get_logger
 
+logger = get_logger("app")
 
-async def main():
-    """The main asynchronous entry point for the application."""
+# The REPL is a single local user.
+REPL_USER_ID = 1
+
+_background_tasks = []
+
+
+async def warm_up():
+    """
+    Gets everything the first turn needs ready and returns the compiled graph. Started as a task
+    so the prompt (or the listening socket) is up immediately; the first turn awaits it.
+    """
+    started = time.perf_counter()
     logger.info("--- System Initializing ---")
+    # Imported on a worker thread so the event loop stays responsive; langchain and langgraph take most of a second.
+    await asyncio.to_thread(importlib.import_module, "agents.pipeline")
+    from db.database import setup_database, warm_pool
+    from db.food_catalog import food_catalog
+
     await setup_database()
+    await asyncio.gather(warm_pool(), food_catalog.load())
+    food_catalog.start_listener()
+    if METRICS_ENABLED and METRICS_DUMP_SECONDS > 0:
+        from core.metrics import dump_periodically
+        _background_tasks.append(asyncio.create_task(dump_periodically(METRICS_DUMP_SECONDS)))
 
-    async with engine.begin() as conn:
-        await conn.execute(
-            text(
-                "INSERT INTO users (user_id, username) VALUES (1, 'test_user') ON CONFLICT (user_id) DO NOTHING;"
-            )
-        )
+    food_agent = await asyncio.to_thread(importlib.import_module, "agents.food_agent")
+    # Each user's conversation persists in Postgres, so follow-ups work across turns and restarts.
+    app = food_agent.get_agent_graph()
+    try:
+        await asyncio.to_thread(food_agent.get_chat_model)
+    except ValueError:
+        # Already logged; fast-path and cached turns still work without the model.
+        pass
+    logger.info("Warmup finished in %.2fs.", time.perf_counter() - started)
+    return app
+
+
+async def shutdown(warmup: asyncio.Task):
+    for task in [warmup, *_background_tasks]:
+        task.cancel()
+    await asyncio.gather(warmup, *_background_tasks, return_exceptions=True)
+    # Whatever warmup got as far as importing is what needs closing.
+    from core.metrics import metrics
+    from db.database import engine
+    from db.food_catalog import food_catalog
+    from tools.web_search import close_http_client
+
+    if metrics.enabled:
+        logger.info("Final metrics snapshot.", extra={"metrics": metrics.snapshot()})
+    await food_catalog.stop_listener()
+    await close_http_client()
+
+    # Dispose of the engine connection pool
+    await engine.dispose()
+    logger.info("--- System Shutting Down ---")
 
-    app = build_agent_graph()
 
+async def print_turn(app, user_input: str):
+    """Prints tool progress as it happens and the reply as it streams in."""
+    from agents.pipeline import ensure_user, turn_events
+    await ensure_user(REPL_USER_ID)
+    shown, line_open = "", False
+    async for event in turn_events(app, REPL_USER_ID, user_input):
+        if event["type"] == "progress":
+            if line_open:
+                print()
+                line_open = False
+            print(f"  ... {event['text']}")
+            continue
+        if not shown:
+            print("Aarogya AI: ", end="")
+        if event["type"] == "token":
+            shown += event["text"]
+            line_open = True
+            print(event["text"], end="", flush=True)
+        else:
+            # Whatever of the reply wasn't streamed (all of it, for a replayed meal) is printed now.
+            reply = event["text"]
+            print(reply[len(shown):] if reply.startswith(shown) else reply)
+
+
+async def run_repl(warmup: asyncio.Task):
     print("\nAarogya AI is ready. How can I help you log your meals?")
     while True:
         try:
@@ -28,31 +98,7 @@ async def main():
                 print("Goodbye!")
                 break
 
-            system_prompt = (
-                "You are a precise, instruction-following diet logging robot named Aarogya.\n\n"
-                "**EXECUTE THIS WORKFLOW EXACTLY:**\n"
-                "1.  For each food item, you **MUST** call the `search_food_database` tool.\n"
-                "2.  **IF THE FOOD IS FOUND:** Immediately proceed to Step 4.\n"
-                "3.  **IF THE FOOD IS NOT FOUND:**\n"
-                "    a. Call `search_internet_for_nutrition_info` **ONCE AND ONLY ONCE**.\n"
-                "    b. If the search fails or returns an error, your task for this item is **FAILED**. Report this failure in your final summary. **DO NOT PROCEED.**\n"
-                "    c. If the search succeeds, parse the data and call `add_new_food_to_database`.\n"
-                "4.  **FINAL ACTION - LOGGING:** After you have the nutritional data (from step 2 or 3c), your final action for that item is to call the `log_food_to_database` tool.\n\n"
-                "**---CRITICAL INSTRUCTION: TASK COMPLETION---**\n"
-                "The `log_food_to_database` tool is the **TERMINAL** step for any successful food item. The moment you call this tool, your work on that specific item is **100% COMPLETE.**\n"
-                "After processing all items from the user's request (either by logging them or marking them as failed), your **ONLY** remaining task is to output a single, natural language summary to the user. The summary must include the macros of the food item. **YOUR FINAL RESPONSE MUST NOT CONTAIN ANY TOOL CALLS.**"
-            )
-
-
-            messages = [
-                HumanMessage(content=f"{system_prompt}\n\nUser's meal: {user_input}")
-            ]
-
-            # Use ainvoke for async execution
-            final_state = await app.ainvoke({"messages": messages})
-
-            final_response = final_state["messages"][-1].content
-            print(f"Aarogya AI: {final_response}")
+            await print_turn(await warmup, user_input)
 
         except KeyboardInterrupt:
             print("\nExiting application.")
@@ -64,10 +110,26 @@ async def main():
                 "Aarogya AI: I'm sorry, an unexpected error occurred. Please check the logs for details."
             )
 
-    # Dispose of the engine connection pool
-    await engine.dispose()
-    logger.info("--- System Shutting Down ---")
+
+async def main(args):
+    """The main asynchronous entry point for the application."""
+    warmup = asyncio.create_task(warm_up())
+    try:
+        if args.serve:
+            from server import run_server
+            await run_server(warmup, args.host, args.port)
+        else:
+            await run_repl(warmup)
+    finally:
+        await shutdown(warmup)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Aarogya AI diet logger.")
+    parser.add_argument("--serve", action="store_true", help="Serve many users over HTTP/WebSocket instead of the terminal REPL.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
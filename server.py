@@ -0,0 +1,203 @@
+import asyncio
+import json
+from aiohttp import web, WSMsgType
+from core.config import EXPORT_MAX_CONCURRENT
+from core.logger import get_logger
+# The app modules (pipeline, export, metrics) are imported inside the handlers, after warmup: they
+# pull in the langchain/langgraph stack, which main.warm_up() loads in a worker thread while the socket opens.
+
+logger = get_logger("server")
+
+ERROR_REPLY = "I'm sorry, an unexpected error occurred. Please check the logs for details."
+
+# Exports keep a DB connection until the client has read everything; capped so they can't starve meal logging.
+export_limiter = asyncio.Semaphore(EXPORT_MAX_CONCURRENT)
+
+
+def _wants_stream(request: web.Request) -> bool:
+    return request.query.get("stream", "").lower() in ("1", "true", "yes")
+
+
+async def _user_id(request: web.Request) -> int:
+    """
+    The user in the path, once the request's bearer token (db/users.py) has proven to belong to them.
+    Unknown users are never created here; they get a token through `python -m db.users add`.
+    """
+    # Tokens are checked in the database, which (like the modules imported below) is ready once warmup is.
+    await _graph(request)
+    from db.users import user_for_token
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise web.HTTPUnauthorized(reason="an 'Authorization: Bearer <token>' header is required", headers={"WWW-Authenticate": "Bearer"})
+    authenticated = await user_for_token(token.strip())
+    if authenticated is None:
+        raise web.HTTPUnauthorized(reason="unknown or revoked token", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        user_id = int(request.match_info["user_id"])
+    except ValueError:
+        raise web.HTTPBadRequest(reason="user_id must be an integer")
+    if user_id != authenticated:
+        raise web.HTTPForbidden(reason="the token doesn't belong to this user")
+    return user_id
+
+
+async def _json_object(request: web.Request) -> dict:
+    try:
+        body = await request.json()
+    except ValueError:    # malformed JSON or undecodable bytes
+        raise web.HTTPBadRequest(reason="the body must be JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(reason="the body must be a JSON object")
+    return body
+
+
+async def _graph(request: web.Request):
+    """The compiled graph; the first requests after startup wait here for warmup to finish."""
+    graph = request.app["graph"]
+    return await graph if isinstance(graph, asyncio.Future) else graph
+
+
+async def health(request: web.Request) -> web.Response:
+    graph = request.app["graph"]
+    return web.json_response({"status": "ok", "ready": not isinstance(graph, asyncio.Future) or graph.done()})
+
+
+async def metrics_endpoint(request: web.Request) -> web.Response:
+    """GET /metrics: latency histograms and token counters in the Prometheus text format (?format=json for a summary)."""
+    await _graph(request)
+    from core.metrics import metrics
+    if not metrics.enabled:
+        raise web.HTTPNotFound(reason="metrics are disabled; set METRICS_ENABLED=true")
+    if request.query.get("format") == "json":
+        return web.json_response(metrics.snapshot())
+    return web.Response(text=metrics.render_prometheus(), content_type="text/plain")
+
+
+async def stream_meal(request: web.Request, user_id: int, user_input: str) -> web.StreamResponse:
+    """NDJSON: one {"type": "progress" | "token" | "reply", "text": ...} object per line, flushed as it happens."""
+    from agents.pipeline import turn_events
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    try:
+        async for event in turn_events(await _graph(request), user_id, user_input):
+            await response.write(json.dumps(event).encode() + b"\n")
+    except Exception:
+        logger.exception("An unhandled error occurred while serving user %s.", user_id)
+        await response.write(json.dumps({"type": "error", "text": ERROR_REPLY}).encode() + b"\n")
+    await response.write_eof()
+    return response
+
+
+async def post_meal(request: web.Request) -> web.StreamResponse:
+    """
+    POST /users/{user_id}/meals with {"text": "2 roti and dal"} -> {"reply": "..."}
+    Every /users/{user_id} route needs that user's token as "Authorization: Bearer <token>".
+    With ?stream=1 the response is NDJSON progress and token events ending in the reply (see stream_meal).
+    """
+    user_id = await _user_id(request)
+    body = await _json_object(request)
+    text = body.get("text")
+    user_input = text.strip() if isinstance(text, str) else ""
+    if not user_input:
+        raise web.HTTPBadRequest(reason="'text' is required")
+    if _wants_stream(request):
+        return await stream_meal(request, user_id, user_input)
+
+    from agents.pipeline import handle_meal
+    try:
+        reply = await handle_meal(await _graph(request), user_id, user_input)
+    except Exception:
+        logger.exception("An unhandled error occurred while serving user %s.", user_id)
+        return web.json_response({"user_id": user_id, "error": ERROR_REPLY}, status=500)
+    return web.json_response({"user_id": user_id, "reply": reply})
+
+
+async def meal_socket(request: web.Request) -> web.WebSocketResponse:
+    """
+    WebSocket /users/{user_id}/ws: each text frame is one user turn, answered with {"reply": "..."}.
+    With ?stream=1 the reply is preceded by {"type": "progress" | "token", "text": ...} frames.
+    """
+    user_id = await _user_id(request)
+    from agents.pipeline import handle_meal, turn_events
+    stream = _wants_stream(request)
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+
+    async for message in ws:
+        if message.type != WSMsgType.TEXT:
+            continue
+        try:
+            if not stream:
+                await ws.send_json({"reply": await handle_meal(await _graph(request), user_id, message.data)})
+                continue
+            async for event in turn_events(await _graph(request), user_id, message.data):
+                if event["type"] == "reply":
+                    await ws.send_json({"type": "reply", "reply": event["text"]})
+                else:
+                    await ws.send_json(event)
+        except Exception:
+            logger.exception("An unhandled error occurred while serving user %s.", user_id)
+            await ws.send_json({"error": ERROR_REPLY})
+    return ws
+
+
+async def export_logs(request: web.Request) -> web.StreamResponse:
+    """
+    GET /users/{user_id}/logs?format=csv|ndjson&since=2026-06-01&until=2026-07-01
+    Streams the user's daily_logs chunk by chunk from a server-side cursor; since/until are optional.
+    Needs the user's token like every other user route; 429 while EXPORT_MAX_CONCURRENT exports are running.
+    """
+    user_id = await _user_id(request)
+    from db.export import ENCODERS, parse_timestamp, stream_logs
+    file_format = request.query.get("format", "ndjson")
+    if file_format not in ENCODERS:
+        raise web.HTTPBadRequest(reason=f"format must be one of: {', '.join(ENCODERS)}")
+    try:
+        since, until = (parse_timestamp(request.query[key]) if request.query.get(key) else None for key in ("since", "until"))
+    except ValueError:
+        raise web.HTTPBadRequest(reason="since/until must be ISO dates or date-times")
+
+    if export_limiter.locked():
+        raise web.HTTPTooManyRequests(reason="too many exports running; try again shortly", headers={"Retry-After": "30"})
+    async with export_limiter:
+        content_type = "text/csv" if file_format == "csv" else "application/x-ndjson"
+        response = web.StreamResponse(headers={"Content-Type": content_type})
+        await response.prepare(request)
+        encode = ENCODERS[file_format]
+        if file_format == "csv":
+            await response.write(encode([], header=True))
+        async for rows in stream_logs(user_id, since, until):
+            await response.write(encode(rows))
+        await response.write_eof()
+    return response
+
+
+def create_app(graph) -> web.Application:
+    """
+    Builds the HTTP/WebSocket front end around one compiled agent graph shared by all sessions.
+    `graph` may also be the task still building it, so the socket can open before warmup is done.
+    """
+    app = web.Application()
+    app["graph"] = graph
+    app.add_routes([
+        web.get("/health", health),
+        web.get("/metrics", metrics_endpoint),
+        web.post("/users/{user_id}/meals", post_meal),
+        web.get("/users/{user_id}/ws", meal_socket),
+        web.get("/users/{user_id}/logs", export_logs),
+    ])
+    return app
+
+
+async def run_server(graph, host: str, port: int):
+    """Serves until cancelled (Ctrl+C)."""
+    runner = web.AppRunner(create_app(graph))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info("Aarogya AI serving on http://%s:%s", host, port)
+    print(f"\nAarogya AI is serving on http://{host}:{port}. Press Ctrl+C to stop.")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -1,4 +1,6 @@
 import os
+import sys
+import asyncio
 from tavily import TavilyClient
 from dotenv import load_dotenv
 
@@ -7,19 +9,21 @@ load_dotenv()
 
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
-if not TAVILY_API_KEY:
-    print("Error: TAVILY_API_KEY not found in .env file.")
-else:
+
+def check_live_tavily():
+    if not TAVILY_API_KEY:
+        print("Error: TAVILY_API_KEY not found in .env file.")
+        return
     print("Tavily API key loaded. Attempting to connect...")
     try:
         client = TavilyClient(api_key=TAVILY_API_KEY)
         # Use a simple, common query
         query = "what is the capital of India"
         print(f"Sending query: '{query}'")
-        
+
         # This is a blocking call
         response = client.search(query=query)
-        
+
         print("\n--- SUCCESS ---")
         print("Successfully received a response from Tavily API.")
         print(response)
@@ -27,4 +31,52 @@ else:
     except Exception as e:
         print("\n--- FAILURE ---")
         print(f"An error occurred while trying to connect to Tavily API: {e}")
-        
\ No newline at end of file
+
+
+async def check_local_web_search(server):
+    """Runs the app's web search against the local stand-in: one upstream request, then cache hits."""
+    from sqlalchemy import text
+    from db.database import engine, setup_database
+    from tools.web_search import search_nutrition, close_http_client
+
+    await setup_database()
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM web_search_cache WHERE query_key = 'test dish'"))
+
+    try:
+        # Five users asking for the same unknown dish at once should cost one Tavily request.
+        results = await asyncio.gather(*(search_nutrition("Test Dish") for _ in range(5)))
+        assert all(r == results[0] and r for r in results), "concurrent callers got different results"
+        assert len(server.requests) == 1, f"expected 1 coalesced request, got {len(server.requests)}"
+        print("Coalescing: 5 concurrent lookups -> 1 upstream request.")
+
+        # A later lookup, with a differently written name, is served from the cache.
+        await search_nutrition("test  dish")
+        assert len(server.requests) == 1, f"expected a cache hit, got {len(server.requests)} requests"
+        print("Caching: repeat lookup served from web_search_cache.")
+    finally:
+        await close_http_client()
+        await engine.dispose()
+
+
+def check_local():
+    from devtools.local_tavily import LocalTavilyServer
+
+    with LocalTavilyServer(latency_seconds=0.3) as server:
+        # Must be set before the app's config module is imported.
+        os.environ["TAVILY_BASE_URL"] = server.url
+        os.environ.setdefault("TAVILY_API_KEY", "local-test-key")
+        try:
+            asyncio.run(check_local_web_search(server))
+            print("\n--- SUCCESS ---")
+        except Exception as e:
+            print("\n--- FAILURE ---")
+            print(f"Local web search check failed: {e}")
+
+
+if __name__ == "__main__":
+    # `python test.py --local` needs only the Postgres from docker-compose, not a Tavily key.
+    if "--local" in sys.argv:
+        check_local()
+    else:
+        check_live_tavily()
@@ -0,0 +1,24 @@
+"""Meal parsing and follow-up detection in agents/fast_path.py."""
+import pytest
+from agents.fast_path import ParsedItem, is_follow_up, parse_meal
+
+
+@pytest.mark.parametrize("text", [
+    "no, make it 3 roti", "No it was 2", "nope brown rice", "no", "not 3, 2", "2 roti not 3",
+    "actually it was brown rice", "remove the rice", "wait, 3 roti", "no i had 2",
+])
+def test_corrections_are_follow_ups(text):
+    assert is_follow_up(text)
+
+
+@pytest.mark.parametrize("text", ["no sugar chai", "no oil paratha", "not too spicy paneer curry", "noodles", "2 roti and dal"])
+def test_meals_are_not_follow_ups(text):
+    assert not is_follow_up(text)
+
+
+def test_parse_meal_splits_items_with_quantities_and_units():
+    assert parse_meal("I had 2 roti, a katori of dal and 200g rice for lunch") == [
+        ParsedItem(raw="2 roti", quantity=2.0, unit=None, food="roti"),
+        ParsedItem(raw="a katori of dal", quantity=1.0, unit="katori", food="dal"),
+        ParsedItem(raw="200g rice", quantity=200.0, unit="g", food="rice"),
+    ]
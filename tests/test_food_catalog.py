@@ -0,0 +1,47 @@
+"""The in-process catalog index (db/food_catalog.py): exact keys, fuzzy search and in-place updates."""
+from db.food_catalog import FoodCatalogIndex
+
+
+def row(food_id, name, *aliases):
+    return {"food_id": food_id, "name": name, "search_aliases": list(aliases)}
+
+
+def index(*rows):
+    catalog = FoodCatalogIndex()
+    catalog._build(rows)
+    return catalog
+
+
+def test_exact_lookup_uses_names_and_aliases():
+    catalog = index(row(1, "Roti", "chapati", "phulka"), row(2, "Dal Tadka"))
+    assert catalog.get_exact("CHAPATI")["food_id"] == 1
+    assert catalog.get_exact("dal  tadka!")["food_id"] == 2
+    assert catalog.get_exact("dal") is None
+
+
+def test_readding_a_renamed_row_forgets_its_old_keys():
+    catalog = index(row(1, "Aloo Paratha", "alu paratha"), row(2, "Dal Tadka"))
+    catalog.add(row(1, "Gobi Paratha", "gobhi paratha"))
+
+    assert catalog.get_exact("aloo paratha") is None and catalog.get_exact("alu paratha") is None
+    assert catalog.get_exact("gobhi paratha")["name"] == "Gobi Paratha"
+    assert all(food["name"] != "Aloo Paratha" for _, food in catalog.search("aloo paratha"))
+    assert [food["food_id"] for _, food in catalog.search("gobi paratha")] == [1]
+
+
+def test_removed_key_passes_to_another_row_that_has_it():
+    catalog = index(row(1, "Roti", "chapati"), row(2, "Phulka", "chapati"), row(3, "Chapati Roll"))
+    catalog.add(row(1, "Tandoori Roti"))
+    assert catalog.get_exact("chapati")["food_id"] == 2
+
+    catalog = index(row(1, "Chapati"), row(2, "Phulka", "chapati"))
+    catalog.add(row(1, "Tandoori Roti"))
+    assert catalog.get_exact("chapati")["food_id"] == 2
+
+
+def test_fuzzy_search_ranks_near_misses():
+    catalog = index(row(1, "Paneer Butter Masala"), row(2, "Butter Chicken"), row(3, "Paneer Tikka"), row(4, "Jeera Rice"))
+    assert catalog.best_match("paneer butter masla")[1]["food_id"] == 1
+    assert [food["food_id"] for _, food in catalog.search("paneer tikka masala", limit=2)][0] == 3
+    assert catalog.best_match("chole bhature") is None
+    assert all(score >= 0.5 for score, _ in catalog.search("butter", min_score=0.5))
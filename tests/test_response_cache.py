@@ -0,0 +1,43 @@
+"""The replayed meal cache (agents/response_cache.py): keys, eviction and catalog invalidation."""
+from agents.response_cache import MealResponseCache, meal_key_text
+
+
+def item(food_id, name):
+    return {"food_id": food_id, "item_name": name, "quantity": 1, "unit": "serving",
+            "calories": 100.0, "protein": 1.0, "carbs": 1.0, "fat": 1.0}
+
+
+def test_key_keeps_numbers_apart():
+    assert meal_key_text("1/2 Katori DAL!") == "1/2 katori dal"
+    assert meal_key_text("1.2 katori dal.") == "1.2 katori dal"
+    assert meal_key_text("2 roti, 1 dal") == "2 roti 1 dal"
+
+
+def test_entries_are_per_user_and_bounded():
+    cache = MealResponseCache(max_entries=2)
+    cache.put(1, "2 roti", [item(1, "roti")], "two roti")
+    assert cache.get(2, "2 roti") is None
+    assert cache.get(1, "2 Roti.").reply == "two roti"
+    assert cache.get(1, "1/2 roti") is None
+    cache.put(1, "dal", [item(2, "dal")], "dal")
+    cache.put(1, "rice", [item(3, "rice")], "rice")
+    assert cache.get(1, "2 roti") is None and cache.get(1, "rice") is not None
+
+
+def test_catalog_changes_evict_by_food_and_by_name():
+    cache = MealResponseCache()
+    cache.put(1, "2 roti", [item(1, "roti")], "roti")
+    cache.put(1, "paneer butter masala", [item(2, "paneer butter masala")], "pbm")
+    cache.put(1, "a bowl of butter chicken", [item(3, "butter chicken")], "bc")
+
+    cache.invalidate_foods([{"food_id": 1, "name": "Phulka"}])
+    assert cache.get(1, "2 roti") is None and cache.get(1, "paneer butter masala") is not None
+    cache.invalidate_foods([{"food_id": 9, "name": "Chicken Butter", "search_aliases": ["paneer masala"]}])
+    assert cache.get(1, "a bowl of butter chicken") is None and cache.get(1, "paneer butter masala") is None
+
+
+def test_bulk_catalog_change_clears_everything():
+    cache = MealResponseCache()
+    cache.put(1, "2 roti", [item(1, "roti")], "roti")
+    cache.invalidate_foods([{"food_id": 1000 + i, "name": f"food {i}"} for i in range(500)])
+    assert cache.get(1, "2 roti") is None and not cache._keys_by_token
@@ -0,0 +1,79 @@
+"""Conversions in core/units.py: serving parsing, unit lookup and servings for each kind of catalog row."""
+import pytest
+from core.units import lookup_unit, parse_serving, portion_items, scale_meal, servings
+
+ROTI = {"food_id": 1, "name": "roti", "serving_unit": "piece", "serving_weight_grams": 40.0,
+        "calories": 120.0, "protein_grams": 3.1, "carbs_grams": 18.0, "fat_grams": 3.7}
+DAL = {"food_id": 2, "name": "dal tadka", "serving_unit": "katori", "serving_weight_grams": 150.0,
+       "calories": 180.0, "protein_grams": 9.0, "carbs_grams": 20.0, "fat_grams": 7.0}
+RICE_100G = {"food_id": 3, "name": "rice", "serving_unit": "100g", "serving_weight_grams": 100.0,
+             "calories": 130.0, "protein_grams": 2.7, "carbs_grams": 28.0, "fat_grams": 0.3}
+BANANA = {"food_id": 4, "name": "banana", "serving_unit": "medium", "serving_weight_grams": 118.0,
+          "calories": 105.0, "protein_grams": 1.3, "carbs_grams": 27.0, "fat_grams": 0.4}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Katoris", "katori"), ("gms", "g"), ("tbsp.", "tbsp"), ("  Cups ", "cup"), ("portion", "serving"),
+])
+def test_lookup_unit_spellings(text, expected):
+    assert lookup_unit(text).name == expected
+
+
+@pytest.mark.parametrize("text", [None, "", "medium", "handful"])
+def test_lookup_unit_unknown(text):
+    assert lookup_unit(text) is None
+
+
+@pytest.mark.parametrize("serving_unit, amount, unit", [
+    ("katori", 1.0, "katori"), ("100g", 100.0, "g"), ("100 g", 100.0, "g"), ("2 pieces", 2.0, "piece"),
+    ("0 g", 1.0, "g"), ("medium", 1.0, None), ("", 1.0, None), (None, 1.0, None),
+])
+def test_parse_serving(serving_unit, amount, unit):
+    parsed_amount, parsed_unit = parse_serving(serving_unit)
+    assert parsed_amount == amount
+    assert (parsed_unit.name if parsed_unit else None) == unit
+
+
+@pytest.mark.parametrize("food, quantity, unit, expected", [
+    (ROTI, 2, None, 2),                 # no unit counts servings
+    (ROTI, 2, "serving", 2),
+    (ROTI, 3, "pieces", 3),             # the food's own unit
+    (ROTI, 80, "g", 2),                 # grams through serving_weight_grams
+    (ROTI, 0.08, "kg", 2),
+    (DAL, 2, "katori", 2),
+    (DAL, 1, "bowl", 250 / 150),        # volume to volume by size
+    (DAL, 300, "ml", 2),
+    (DAL, 75, "g", 0.5),
+    (RICE_100G, 250, "g", 2.5),         # "100g" rows divide by the serving amount
+    (RICE_100G, 1, "katori", 1.5),      # household measure via HOUSEHOLD_GRAMS for a mass serving
+    (BANANA, 2, "Medium", 2),           # the catalog's own free-text wording
+    (BANANA, 236, "g", 2),
+    (BANANA, 1, "plate", 300 / 118),    # free-text servings with a weight take household grams too
+])
+def test_servings_converts(food, quantity, unit, expected):
+    assert servings(food, quantity, unit) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("food, unit", [
+    (DAL, "piece"),                     # pieces of something served by the katori
+    (ROTI, "katori"),                   # a household measure of something counted in pieces
+    (BANANA, "large"),                  # free text that isn't the catalog's
+    ({**DAL, "serving_weight_grams": None}, "g"),
+])
+def test_servings_refuses_unsafe_conversions(food, unit):
+    assert servings(food, 1, unit) is None
+
+
+def test_scale_meal_rounds_each_column():
+    assert scale_meal([ROTI, DAL], [2, 0.5]) == [
+        {"calories": 240.0, "protein": 6.2, "carbs": 36.0, "fat": 7.4},
+        {"calories": 90.0, "protein": 4.5, "carbs": 10.0, "fat": 3.5},
+    ]
+
+
+def test_portion_items_keeps_order_and_marks_unconvertible():
+    items = portion_items([(ROTI, 2, None), (DAL, 1, "piece"), (RICE_100G, 150, "grams"), (BANANA, 1, "medium")])
+    assert items[1] is None
+    assert [item["unit"] for item in (items[0], items[2], items[3])] == ["piece", "g", "medium"]
+    assert items[0]["item_name"] == "roti" and items[0]["calories"] == 240.0
+    assert items[2]["quantity"] == 150 and items[2]["calories"] == 195.0
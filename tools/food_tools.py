@@ -1,13 +1,22 @@
 import asyncio
 import json
-from sqlalchemy import text, JSON
+import logging
+from typing import List, Optional
+from sqlalchemy import text
 from langchain_core.tools import tool
-from langchain_tavily import TavilySearch 
+from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 from core.config import TAVILY_API_KEY
-from tavily import TavilyClient
 from db.database import engine
-from core.logger import logger
+from db.food_catalog import food_catalog, normalize_food_name, CATALOG_COLUMNS, MATCH_THRESHOLD
+from db.rollups import SUBTRACT_ROLLUPS_FROM, UPSERT_ROLLUPS_FROM, fetch_totals
+from core.units import portion_items
+from tools.web_search import WebSearchError, search_nutrition
+from core.logger import get_logger
+
+logger = get_logger("tools")
+# Full rows and search snippets; silence with LOG_LEVELS="aarogya.payload=WARNING".
+payload_logger = get_logger("payload")
 
 # --- Pydantic Schemas remain the same ---
 class FoodSearchInput(BaseModel):
@@ -22,6 +31,37 @@ class AddFoodDBInput(BaseModel):
     carbs_grams: float = Field(description="Grams of carbohydrates per serving.")
     fat_grams: float = Field(description="Grams of fat per serving.")
 
+class FoodBatchSearchInput(BaseModel):
+    food_names: List[str] = Field(description="Every food item in the meal, one name per entry. E.g., ['roti', 'dal', 'rice', 'jalebi']")
+
+class NutritionTotalsInput(BaseModel):
+    period: str = Field(default="today", description="Which days to total: 'today', 'yesterday' or 'week' (the last 7 days).")
+
+class LogFoodItem(BaseModel):
+    food_name: str = Field(description="The food's name exactly as the database search returned it (or as you added it).")
+    quantity: float = Field(gt=0, description="How much was eaten, in `unit`. E.g., 2 for '2 roti', 150 for '150g rice', 0.5 for 'half a katori'.")
+    unit: Optional[str] = Field(default=None, description="The unit the user gave: 'katori', 'plate', 'piece', 'g', 'cup', 'ml'... Leave empty to count the food's own servings.")
+
+class LogFoodBatchInput(BaseModel):
+    items: List[LogFoodItem] = Field(description="Every food item of the meal to log with the amount eaten. Macros are computed from the database.")
+
+class RemoveLoggedFoodsInput(BaseModel):
+    food_names: List[str] = Field(description="The logged names of the entries to take back, as the logging tool returned them (item_name). Each name removes that food's latest entry from today.")
+
+# Fields of an indian_food_items row that are handed back to the model.
+FOOD_RESULT_FIELDS = ("name", "serving_unit", "serving_weight_grams", "calories", "protein_grams", "carbs_grams", "fat_grams")
+
+def get_user_id(config: RunnableConfig) -> int:
+    """The user a graph run acts for, passed in as config={"configurable": {"user_id": ...}}."""
+    user_id = (config or {}).get("configurable", {}).get("user_id")
+    if user_id is None:
+        raise ValueError("No user_id in the run config; pass it under config['configurable'].")
+    return user_id
+
+def committed_items_sink(config: RunnableConfig) -> Optional[list]:
+    """The list a turn passes as config["configurable"]["committed_items"] to learn what the logging tools wrote."""
+    return (config or {}).get("configurable", {}).get("committed_items")
+
 # --- Tool Definitions are now async ---
 
 @tool(args_schema=FoodSearchInput)
@@ -30,131 +70,351 @@ async def search_food_database(food_name: str) -> str:
     Searches the local database for nutritional info of a given food item.
     This should be the FIRST tool you use for any food item.
     """
-    logger.info(f"Searching local DB for '{food_name}'...")
+    logger.info("Searching local DB for '%s'...", food_name)
+    if not food_catalog.loaded:
+        return await _search_food_database_sql(food_name)
+
+    return json.dumps(_lookup_in_catalog(food_name))
+
+
+def _lookup_in_catalog(food_name: str) -> dict:
+    """Resolves one name against the in-memory catalog index into the dict handed back to the model."""
+    candidates = food_catalog.search(food_name)
+    if candidates and candidates[0][0] >= MATCH_THRESHOLD:
+        score, row = candidates[0]
+        data = {key: row[key] for key in FOOD_RESULT_FIELDS}
+        if score < 1.0:
+            data["matched_query"] = food_name
+            data["match_score"] = score
+        payload_logger.info("Found '%s' in catalog index: %s", food_name, data)
+        return data
+
+    logger.warning("'%s' not found in catalog index.", food_name)
+    response = {"error": "Food item not found in the database. You may need to find it online."}
+    if candidates:
+        # Near misses let the model retry with a known name instead of going to the internet.
+        response["similar_items"] = [row["name"] for _, row in candidates]
+    return response
+
+
+async def _search_food_database_sql(food_name: str) -> str:
+    """Direct database lookup, used until the catalog index has been loaded."""
     async with engine.connect() as connection:
         query = text("""
             SELECT name, serving_unit, serving_weight_grams, calories, protein_grams, carbs_grams, fat_grams
             FROM indian_food_items
-            WHERE name ILIKE :name OR :name = ANY(search_aliases)
+            WHERE name ILIKE :name OR search_aliases @> ARRAY[CAST(:name AS TEXT)]
         """)
         result = await connection.execute(query, {"name": food_name})
         record = result.fetchone()
 
         if record:
             data = dict(record._mapping)
-            logger.info(f"Found '{food_name}' in DB: {data}")
+            payload_logger.info("Found '%s' in DB: %s", food_name, data)
             return json.dumps(data)
         else:
-            logger.warning(f"'{food_name}' not found in DB.")
+            logger.warning("'%s' not found in DB.", food_name)
             return json.dumps({"error": "Food item not found in the database. You may need to find it online."})
 
-@tool
-async def log_food_to_database(item_name: str, quantity: float, unit: str, calories: float, protein: float, carbs: float, fat: float) -> str:
-    """Logs a consumed food item with its full nutritional details to the daily_logs table. Use this AFTER you have the nutritional info."""
-    logger.info(f"TOOL: Logging to DB: {quantity} {unit} of {item_name}")
+@tool(args_schema=FoodBatchSearchInput)
+async def search_food_database_batch(food_names: List[str]) -> str:
+    """
+    Searches the local database for the nutritional info of several food items at once.
+    Prefer this over `search_food_database` whenever the meal has more than one item.
+    Returns a JSON object keyed by each requested name.
+    """
+    logger.info("Batch searching local DB for %s...", food_names)
+    if food_catalog.loaded:
+        return json.dumps({food_name: _lookup_in_catalog(food_name) for food_name in food_names})
+
+    # One round trip for the whole meal, with the same matching rules as the single-item query.
+    async with engine.connect() as connection:
+        query = text("""
+            SELECT q.query, f.name, f.serving_unit, f.serving_weight_grams, f.calories, f.protein_grams, f.carbs_grams, f.fat_grams
+            FROM unnest(CAST(:names AS TEXT[])) AS q(query)
+            LEFT JOIN LATERAL (
+                SELECT * FROM indian_food_items
+                WHERE name ILIKE q.query OR search_aliases @> ARRAY[q.query]
+                LIMIT 1
+            ) f ON TRUE
+        """)
+        result = await connection.execute(query, {"names": list(food_names)})
+        records = result.fetchall()
+
+    results = {}
+    for record in records:
+        data = dict(record._mapping)
+        food_name = data.pop("query")
+        if data["name"] is None:
+            logger.warning("'%s' not found in DB.", food_name)
+            results[food_name] = {"error": "Food item not found in the database. You may need to find it online."}
+        else:
+            results[food_name] = data
+    return json.dumps(results)
+
+
+# Columns of a food row in daily_logs, in the order insert_food_logs binds them.
+FOOD_LOG_COLUMNS = ("food_id", "item_name", "quantity", "unit", "calories", "protein", "carbs", "fat")
+
+
+async def insert_food_logs(connection, user_id: int, items: List[dict]):
+    """
+    Writes every item as a daily_logs row with a single multi-row INSERT on the caller's connection,
+    and folds the same rows into daily_nutrition_rollups in that statement, so both commit together.
+    Items without a food_id are linked to the catalog row their item_name resolves to exactly, if any.
+    """
+    # One typed array per column, zipped back into rows by unnest: no JSON encoding on either side.
+    stmt = text("""
+        WITH source AS (
+            INSERT INTO daily_logs (user_id, log_type, food_id, item_name, quantity, unit, calories, protein, carbs, fat)
+            SELECT :user_id, 'food', COALESCE(i.food_id, f.food_id), i.item_name, i.quantity, i.unit, i.calories, i.protein, i.carbs, i.fat
+            FROM unnest(
+                CAST(:food_id AS INTEGER[]), CAST(:item_name AS TEXT[]), CAST(:quantity AS REAL[]), CAST(:unit AS TEXT[]),
+                CAST(:calories AS REAL[]), CAST(:protein AS REAL[]), CAST(:carbs AS REAL[]), CAST(:fat AS REAL[])
+            ) AS i(food_id, item_name, quantity, unit, calories, protein, carbs, fat)
+            LEFT JOIN indian_food_items f ON i.food_id IS NULL AND f.name = i.item_name
+            RETURNING user_id, log_time, calories, protein, carbs, fat
+        )
+    """ + UPSERT_ROLLUPS_FROM)
+    if food_catalog.loaded:
+        for item in items:
+            if item.get("food_id") is None:
+                food = food_catalog.get_exact(item["item_name"])
+                item["food_id"] = food["food_id"] if food else None
+    params = {column: [item.get(column) for item in items] for column in FOOD_LOG_COLUMNS}
+    await connection.execute(stmt, {"user_id": user_id, **params})
+
+
+# normalize_food_name in SQL (bar the accent folding), so the pre-load lookup matches exactly what the index does.
+_NORMALIZED_SQL = "btrim(regexp_replace(lower({}), '[^a-z0-9]+', ' ', 'g'))"
+
+
+async def _foods_by_name(connection, food_names: List[str]) -> dict:
+    """
+    Name -> catalog row for every name that is exactly a food's name or alias, after normalization:
+    from the index once loaded, else in one query. Near misses are not logged as some other food.
+    """
+    if food_catalog.loaded:
+        foods = {}
+        for food_name in food_names:
+            match = food_catalog.get_exact(food_name)
+            if match is not None:
+                foods[food_name] = match
+        return foods
+
+    name, alias = _NORMALIZED_SQL.format("name"), _NORMALIZED_SQL.format("a.alias")
+    query = text(f"""
+        SELECT q.query, f.*
+        FROM unnest(CAST(:names AS TEXT[]), CAST(:keys AS TEXT[])) AS q(query, key)
+        JOIN LATERAL (
+            SELECT {CATALOG_COLUMNS} FROM indian_food_items
+            WHERE {name} = q.key
+               OR EXISTS (SELECT 1 FROM unnest(search_aliases) AS a(alias) WHERE {alias} = q.key)
+            -- Names win over aliases, as in the index.
+            ORDER BY {name} = q.key DESC, food_id
+            LIMIT 1
+        ) f ON TRUE
+    """)
+    names = list(food_names)
+    rows = (await connection.execute(query, {"names": names, "keys": [normalize_food_name(n) for n in names]})).mappings().all()
+    return {row["query"]: dict(row) for row in rows}
+
+
+async def remove_food_logs(user_id: int, food_names: List[str]) -> str:
+    """
+    Deletes the latest of today's entries for each name and subtracts them from daily_nutrition_rollups
+    in the same statement. Returns JSON with the removed items and the names that matched no entry.
+    """
+    stmt = text(f"""
+        WITH source AS (
+            DELETE FROM daily_logs d
+            USING (
+                SELECT DISTINCT ON (q.name) q.name, l.log_id
+                FROM unnest(CAST(:names AS TEXT[])) AS q(name)
+                JOIN daily_logs l ON l.user_id = :user_id AND l.log_type = 'food' AND CAST(l.log_time AS DATE) = CURRENT_DATE
+                    AND {_NORMALIZED_SQL.format("l.item_name")} = {_NORMALIZED_SQL.format("q.name")}
+                ORDER BY q.name, l.log_id DESC
+            ) AS latest
+            WHERE d.log_id = latest.log_id
+            RETURNING latest.name AS query, d.user_id, d.log_time, d.item_name, d.quantity, d.unit, d.calories, d.protein, d.carbs, d.fat
+        ), rollups AS ({SUBTRACT_ROLLUPS_FROM})
+        SELECT query, item_name, quantity, unit, calories, protein, carbs, fat FROM source
+    """)
+    async with engine.begin() as connection:
+        rows = (await connection.execute(stmt, {"user_id": user_id, "names": list(food_names)})).mappings().all()
+    removed = {row["query"] for row in rows}
+    return json.dumps({
+        "removed": [{key: row[key] for key in row.keys() if key != "query"} for row in rows],
+        "not_found": [name for name in food_names if name not in removed],
+    })
+
+
+def _not_found(food_name: str) -> str:
+    suggestion = food_catalog.best_match(food_name) if food_catalog.loaded else None
+    if suggestion is not None:
+        return (f"Not in the food database under this name; the closest is '{suggestion[1]['name']}'. "
+                "If that is the same food, log it under that exact name; otherwise search for it (or add it) first.")
+    return "Not in the food database. Search for it (or add it) first."
+
+
+async def log_portions(user_id: int, portions: List[dict], committed: Optional[list] = None) -> str:
+    """
+    Logs {"food_name", "quantity", "unit"} portions with macros computed from the catalog, in one
+    transaction. Returns JSON with the logged items and, for anything that wasn't, the reason.
+    Once the transaction commits, the logged items are also appended to `committed`, if given.
+    """
+    async with engine.begin() as connection:
+        foods = await _foods_by_name(connection, [portion["food_name"] for portion in portions])
+        found = [portion for portion in portions if portion["food_name"] in foods]
+        items = iter(portion_items([(foods[p["food_name"]], p["quantity"], p.get("unit")) for p in found]))
+
+        logged, not_logged = [], []
+        for portion in portions:
+            food = foods.get(portion["food_name"])
+            item = next(items) if food is not None else None
+            if item is not None:
+                logged.append(item)
+            elif food is None:
+                not_logged.append({"food_name": portion["food_name"], "error": _not_found(portion["food_name"])})
+            else:
+                not_logged.append({
+                    "food_name": portion["food_name"],
+                    "error": f"Can't convert '{portion.get('unit')}' for this food; it is served per {food['serving_unit']} "
+                             f"({food['serving_weight_grams']:g} g). Give the amount in grams or in {food['serving_unit']}.",
+                })
+        if logged:
+            await insert_food_logs(connection, user_id, logged)
+    if committed is not None:
+        committed.extend(logged)
+    return json.dumps({"logged": logged, "not_logged": not_logged})
+
+
+@tool(args_schema=LogFoodItem)
+async def log_food_to_database(food_name: str, quantity: float, config: RunnableConfig, unit: Optional[str] = None) -> str:
+    """
+    Logs one consumed food item to the daily_logs table. Give the food's database name and the amount eaten;
+    the macros are computed for you and returned. Use this AFTER the food has been found (or added).
+    """
+    logger.info("TOOL: Logging to DB: %s %s of %s", quantity, unit or "serving", food_name)
     try:
-        async with engine.begin() as connection:
-            details = {
-                "item_name": item_name, "quantity": quantity, "unit": unit,
-                "calories": calories, "protein": protein, "carbs": carbs, "fat": fat
-            }
-            
-            # THE FIX: We explicitly mark the 'details' parameter as being of the JSON type.
-            # We also convert our dictionary to a JSON string before sending it.
-            stmt = text("INSERT INTO daily_logs (user_id, log_type, details) VALUES (:user_id, 'food', :details)")
-            stmt = stmt.bindparams(details=JSON()) # <-- This tells SQLAlchemy how to handle the parameter
-
-            await connection.execute(
-                stmt, 
-                {
-                    "user_id": 1, 
-                    "details": json.dumps(details) # <-- Pass the data as a JSON string
-                }
-            )
-        return f"Successfully logged {item_name} to the database."
+        return await log_portions(get_user_id(config), [{"food_name": food_name, "quantity": quantity, "unit": unit}],
+                                  committed_items_sink(config))
+    except Exception as e:
+        logger.error("DATABASE ERROR in log_food_to_database: %s", e, exc_info=True)
+        return f"Error: Failed to log '{food_name}' to the database due to an internal error."
+
+
+@tool(args_schema=LogFoodBatchInput)
+async def log_foods_to_database(items: List[LogFoodItem], config: RunnableConfig) -> str:
+    """
+    Logs several consumed food items to the daily_logs table in one transaction; the macros are computed for you and returned.
+    Prefer this over `log_food_to_database` whenever the meal has more than one item. Use this AFTER every food has been found (or added).
+    """
+    names = [item.food_name for item in items]
+    logger.info("TOOL: Batch logging %s items to DB: %s", len(items), names)
+    try:
+        return await log_portions(get_user_id(config), [item.model_dump() for item in items], committed_items_sink(config))
     except Exception as e:
-        logger.error(f"DATABASE ERROR in log_food_to_database: {e}", exc_info=True)
-        return f"Error: Failed to log '{item_name}' to the database due to an internal error."
+        logger.error("DATABASE ERROR in log_foods_to_database: %s", e, exc_info=True)
+        return f"Error: Failed to log {', '.join(names)} to the database due to an internal error."
+
+
+@tool(args_schema=RemoveLoggedFoodsInput)
+async def remove_logged_foods(food_names: List[str], config: RunnableConfig) -> str:
+    """
+    Takes back food entries logged today, for corrections ("make that two", "actually it was brown rice", "remove the rice"):
+    removes the latest entry of each named food and its macros from the totals. Log the corrected items afterwards.
+    """
+    logger.info("TOOL: Removing logged entries: %s", food_names)
+    try:
+        return await remove_food_logs(get_user_id(config), food_names)
+    except Exception as e:
+        logger.error("DATABASE ERROR in remove_logged_foods: %s", e, exc_info=True)
+        return f"Error: Failed to remove {', '.join(food_names)} from the log due to an internal error."
+
+
+@tool(args_schema=NutritionTotalsInput)
+async def get_nutrition_totals(config: RunnableConfig, period: str = "today") -> str:
+    """
+    Returns the user's total calories, protein, carbs and fat logged for a period.
+    Use this when the user asks how much they have eaten, e.g. "how many calories today?".
+    """
+    logger.info("TOOL: Reading nutrition totals for period '%s'", period)
+    try:
+        return json.dumps(await fetch_totals(get_user_id(config), period))
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+    except Exception as e:
+        logger.error("DATABASE ERROR in get_nutrition_totals: %s", e, exc_info=True)
+        return json.dumps({"error": "Failed to read nutrition totals due to an internal error."})
 
 
 @tool(args_schema=AddFoodDBInput)
 async def add_new_food_to_database(name: str, serving_unit: str, serving_weight_grams: float, calories: float, protein_grams: float, carbs_grams: float, fat_grams: float) -> str:
     """Adds a new, previously unknown food item and its nutritional information to the 'indian_food_items' master table. Use this tool to save new information you found online."""
-    logger.info(f"TOOL: Adding new food to master DB: '{name}'")
+    logger.info("TOOL: Adding new food to master DB: '%s'", name)
     try:
         async with engine.begin() as connection:
-            stmt = text("""
+            stmt = text(f"""
                 INSERT INTO indian_food_items (name, serving_unit, serving_weight_grams, calories, protein_grams, carbs_grams, fat_grams)
                 VALUES (:name, :serving_unit, :serving_weight_grams, :calories, :protein_grams, :carbs_grams, :fat_grams)
-                ON CONFLICT (name) DO NOTHING;
+                ON CONFLICT (name) DO NOTHING
+                RETURNING {CATALOG_COLUMNS};
             """)
             # This tool was already correct as it doesn't write JSON, but adding a try/except is good practice.
-            await connection.execute(stmt, {
+            result = await connection.execute(stmt, {
                 "name": name, "serving_unit": serving_unit, "serving_weight_grams": serving_weight_grams,
                 "calories": calories, "protein_grams": protein_grams, "carbs_grams": carbs_grams, "fat_grams": fat_grams
             })
-        logger.info(f"Successfully added '{name}' to the master food database.")
+            record = result.fetchone()
+        if record and food_catalog.loaded:
+            # Make the new item searchable right away instead of waiting for the change notification.
+            food_catalog.add(dict(record._mapping))
+        logger.info("Successfully added '%s' to the master food database.", name)
         return f"Successfully added '{name}' to the master food database."
     except Exception as e:
-        logger.error(f"DATABASE ERROR in add_new_food_to_database: {e}", exc_info=True)
+        logger.error("DATABASE ERROR in add_new_food_to_database: %s", e, exc_info=True)
         return f"Error: Failed to add '{name}' to the master food database due to an internal error."
 
-# search_internet_tool = TavilySearch(max_results=3)
-# search_internet_tool.name = "search_internet_for_nutrition"
-# search_internet_tool.description = (
-#     "Use this tool ONLY when you cannot find a food item in the local 'search_food_database'. "
-#     "Search for specific queries like 'nutritional information for 1 katori of vegetable biryani' to get the best results. "
-#     "The search result will be a text snippet. You must parse it to extract the required nutritional values."
-# )
-
-
-
 @tool
-def search_internet_for_nutrition(food_name: str) -> str:
+async def search_internet_for_nutrition(food_name: str) -> str:
     """
     Use this tool ONLY when a food item is not found in the local database.
-    It searches the internet synchronously and returns a formatted string of nutritional information.
+    It searches the internet and returns a formatted string of nutritional information.
     """
-    logger.info(f"TOOL: Searching internet for '{food_name}' (synchronous call)...")
+    logger.info("TOOL: Searching internet for '%s'...", food_name)
     
     if not TAVILY_API_KEY:
         logger.error("Tavily API key not configured.")
         return "Error: The internet search service is not configured."
     
-    query = f"nutritional information for 1 serving of {food_name} with macros"
-    logger.info(f"Constructed Tavily Query: '{query}'")
-    
     try:
-        # Initialize the synchronous client
-        # The default timeout for the underlying HTTP client is 5 seconds.
-        # We can be explicit if we want.
-        client = TavilyClient(api_key=TAVILY_API_KEY)
-        
-        # This is a standard, blocking function call.
-        # The LangChain/LangGraph runner will place this call in a thread.
-        search_results = client.search(query=query, search_depth="basic", max_results=3)
-        
-        results_list = search_results.get('results', [])
+        # Pooled async client, result cache and request coalescing all live in tools/web_search.py.
+        results_list = await search_nutrition(food_name)
         
         if not results_list:
-            logger.warning(f"Internet search for '{food_name}' yielded no results from Tavily.")
+            logger.warning("Internet search for '%s' yielded no results from Tavily.", food_name)
             return "No information found online."
 
         # Log metadata
-        logger.info(f"Tavily search returned {len(results_list)} results. Logging raw metadata:")
-        for i, result in enumerate(results_list):
-            log_entry = { "result_index": i + 1, "url": result.get("url"), "content_snippet": result.get("content", "N/A")[:250] + "..." }
-            logger.info(f"Tavily Result Metadata: {json.dumps(log_entry)}")
+        logger.info("Tavily search returned %s results.", len(results_list))
+        if payload_logger.isEnabledFor(logging.INFO):
+            for i, result in enumerate(results_list):
+                log_entry = { "result_index": i + 1, "url": result.get("url"), "content_snippet": result.get("content", "N/A")[:250] + "..." }
+                payload_logger.info("Tavily Result Metadata: %s", json.dumps(log_entry))
             
         # Format for LLM
         formatted_string = f"Search Results for '{food_name}':\n\n"
         for i, result in enumerate(results_list):
             formatted_string += f"--- Result {i+1} ---\nContent: {result.get('content', 'N/A')}\n\n"
         
-        logger.info(f"Formatted internet search results for '{food_name}' prepared for LLM.")
+        logger.info("Formatted internet search results for '%s' prepared for LLM.", food_name)
         return formatted_string
 
+    except WebSearchError as e:
+        # Timeouts, HTTP errors and an open circuit: the provider is struggling, so don't retry through the model.
+        logger.error("Tavily search for '%s' failed: %s", food_name, e)
+        return "Error: The internet search service is unavailable right now. Do not retry; report this item as failed."
     except Exception as e:
-        # This will catch timeouts from the underlying httpx client, or any other API error.
-        logger.error(f"An unexpected error occurred during synchronous Tavily search for '{food_name}': {e}", exc_info=True)
+        logger.error("An unexpected error occurred during Tavily search for '%s': %s", food_name, e, exc_info=True)
         return "Error: An unexpected error occurred with the internet search service."
\ No newline at end of file
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import httpx
+from sqlalchemy import text
+from core.config import TAVILY_API_KEY, TAVILY_BASE_URL, WEB_SEARCH_CACHE_TTL_HOURS, TAVILY_TIMEOUT_SECONDS
+from db.database import engine
+from db.food_catalog import normalize_food_name
+from core.logger import get_logger
+from core.metrics import metrics
+from core.resilience import ProviderUnavailable, tavily_client
+
+logger = get_logger("web")
+
+# --- Configuration ---
+SEARCH_DEPTH = "basic"
+MAX_RESULTS = 3
+# A backstop only: core/resilience.py enforces the per-attempt timeout and the overall deadline.
+REQUEST_TIMEOUT = httpx.Timeout(TAVILY_TIMEOUT_SECONDS + 2.0, connect=5.0)
+CONNECTION_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+
+# One pooled client per process; created lazily so importing this module stays cheap.
+_client = None
+# Cache key -> in-flight lookup, so concurrent identical queries share one request.
+_in_flight = {}
+
+
+class WebSearchError(Exception):
+    """Raised when the search provider cannot be reached or returns an error."""
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=TAVILY_BASE_URL,
+            headers={"Authorization": f"Bearer {TAVILY_API_KEY}"},
+            timeout=REQUEST_TIMEOUT,
+            limits=CONNECTION_LIMITS,
+            event_hooks=metrics.httpx_hooks(),
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def build_query(food_name: str) -> str:
+    return f"nutritional information for 1 serving of {food_name} with macros"
+
+
+async def _read_cache(key: str):
+    async with engine.connect() as connection:
+        result = await connection.execute(
+            text("""
+                SELECT results FROM web_search_cache
+                WHERE query_key = :key AND fetched_at > CURRENT_TIMESTAMP - make_interval(hours => :ttl_hours)
+            """),
+            {"key": key, "ttl_hours": WEB_SEARCH_CACHE_TTL_HOURS},
+        )
+        return result.scalar()
+
+
+async def _write_cache(key: str, results: list):
+    async with engine.begin() as connection:
+        await connection.execute(
+            text("""
+                INSERT INTO web_search_cache (query_key, results) VALUES (:key, CAST(:results AS JSONB))
+                ON CONFLICT (query_key) DO UPDATE SET results = EXCLUDED.results, fetched_at = CURRENT_TIMESTAMP
+            """),
+            {"key": key, "results": json.dumps(results)},
+        )
+
+
+async def _post_search(query: str) -> list:
+    response = await get_http_client().post(
+        "/search",
+        json={"query": query, "search_depth": SEARCH_DEPTH, "max_results": MAX_RESULTS},
+    )
+    response.raise_for_status()
+    return response.json().get("results", [])
+
+
+async def _fetch(food_name: str) -> list:
+    query = build_query(food_name)
+    logger.info("Constructed Tavily Query: '%s'", query)
+    try:
+        # Timeouts, retries, hedging and the circuit breaker: see core/resilience.py.
+        return await tavily_client.call(lambda: _post_search(query))
+    except (ProviderUnavailable, httpx.HTTPError) as e:
+        raise WebSearchError(f"Tavily request for '{food_name}' failed: {e}") from e
+
+
+async def _lookup(key: str, food_name: str) -> list:
+    try:
+        cached = await _read_cache(key)
+    except Exception as e:
+        # A cache outage should cost latency, not the search itself.
+        logger.error("Web search cache read failed for '%s': %s", key, e, exc_info=True)
+        cached = None
+    if cached is not None:
+        logger.info("Web search cache hit for '%s'.", key)
+        return cached
+
+    results = await _fetch(food_name)
+    if results:
+        try:
+            await _write_cache(key, results)
+        except Exception as e:
+            logger.error("Web search cache write failed for '%s': %s", key, e, exc_info=True)
+    return results
+
+
+async def search_nutrition(food_name: str) -> list:
+    """
+    Returns Tavily results for the nutrition of `food_name`.
+    Served from the web_search_cache table while fresh; concurrent calls for the same food share one lookup.
+    """
+    key = normalize_food_name(food_name)
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_lookup(key, food_name))
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    else:
+        logger.info("Joining in-flight web search for '%s'.", key)
+    # Shielded so one caller giving up doesn't cancel the lookup for everyone else waiting on it.
+    return await asyncio.shield(task)